@@ -1,16 +1,139 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
 import requests
 import pandas as pd
-
-API_BASE_URL = "https://api.openf1.org/v1"
+from requests.adapters import HTTPAdapter
+
+import instrumentation
+import single_flight
+
+API_BASE_URL = os.environ.get("OPENF1_API_URL", "https://api.openf1.org/v1")
+
+MAX_WORKERS = 8
+# Budżet wspólny dla całego procesu, czyli dla wszystkich widzów aplikacji naraz.
+MAX_CONCURRENT_REQUESTS = MAX_WORKERS
+REQUESTS_PER_SECOND = 6
+RETRY_TOTAL = 5
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+STREAM_WINDOW = timedelta(minutes=10)
+MERGE_TOLERANCE = pd.Timedelta('1s')
+# Zwarty schemat telemetrii: współrzędne w float32, bieg/gaz/hamulec/DRS w liczbach 8-bitowych, numer kierowcy
+# jako kategoria. Brakujące wartości kolumn całkowitych (brak pary w car_data) są zastępowane zerem.
+TELEMETRY_SCHEMA = {
+    'driver_number': 'category',
+    'x': 'float32', 'y': 'float32', 'z': 'float32',
+    'speed': 'float32', 'rpm': 'float32',
+    'n_gear': 'int8', 'throttle': 'uint8', 'brake': 'uint8', 'drs': 'uint8',
+}
+CONSTANT_COLUMNS = ['session_key', 'meeting_key']
+LOCATION_COLUMNS = ['date', 'driver_number', 'x', 'y', 'z', 'session_key', 'meeting_key']
+CAR_DATA_COLUMNS = ['date', 'driver_number', 'speed', 'rpm', 'n_gear', 'throttle', 'brake', 'drs']
+
+
+class SessionFetchError(RuntimeError):
+    """Nie udało się pobrać okna danych sesji (błąd API), w odróżnieniu od okna bez danych."""
+
+
+class HostRateLimiter:
+    """Ogranicza liczbę zapytań na sekundę osobno dla każdego hosta."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _build_session():
+    # Ponowienia obsługuje _fetch, aby każda próba przechodziła przez limit zapytań.
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_http_session = _build_session()
+_rate_limiter = HostRateLimiter(REQUESTS_PER_SECOND)
+_request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+_api_flight = single_flight.SingleFlight('api')
+_session_flight = single_flight.SingleFlight('session_data')
+
+
+def set_rate_limit(rate):
+    """Ustawia limit zapytań na sekundę do każdego hosta w tym procesie; 0 wyłącza limit."""
+    global _rate_limiter
+    _rate_limiter = HostRateLimiter(rate)
 
 
 def fetch_api_data(endpoint, params=None):
+    """Zwraca rekordy JSON endpointu; identyczne zapytania wykonywane równocześnie trafiają do API tylko raz."""
     full_url = requests.Request('GET', f"{API_BASE_URL}/{endpoint}", params=params).prepare().url
+    return _api_flight.do(full_url, lambda: _fetch(endpoint, params, full_url))
+
+
+def _retry_delay(response, attempt):
+    """Czas oczekiwania przed kolejną próbą: nagłówek Retry-After, a bez niego wykładniczy backoff."""
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return RETRY_BACKOFF * 2 ** attempt
+
+
+def _get(endpoint, params, full_url):
+    """Zapytanie GET z ponowieniami po błędach połączenia i statusach RETRY_STATUSES.
+
+    Każda próba zajmuje miejsce w puli zapytań i przechodzi przez limit zapytań hosta; oczekiwanie między
+    próbami odbywa się poza pulą.
+    """
+    for attempt in range(RETRY_TOTAL + 1):
+        response = None
+        try:
+            with _request_slots:
+                _rate_limiter.wait(full_url)
+                with instrumentation.span('http', endpoint=endpoint, attempt=attempt) as span:
+                    response = _http_session.get(f"{API_BASE_URL}/{endpoint}", params=params)
+                    span['status'] = response.status_code
+                    span['bytes'] = len(response.content)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == RETRY_TOTAL:
+                raise
+        if response is not None and (response.status_code not in RETRY_STATUSES or attempt == RETRY_TOTAL):
+            return response
+        time.sleep(_retry_delay(response, attempt))
+
+
+def _fetch(endpoint, params, full_url):
     print(f"--- Zapytanie do API: {full_url} ---")
     try:
-        response = requests.get(f"{API_BASE_URL}/{endpoint}", params=params)
+        response = _get(endpoint, params, full_url)
         response.raise_for_status()
-        data = response.json()
+        with instrumentation.span('json_decode', endpoint=endpoint, bytes=len(response.content)):
+            data = response.json()
         print(f"--- Otrzymano {len(data)} rekordów.")
         return data
     except requests.exceptions.RequestException as e:
@@ -44,6 +167,11 @@ def get_drivers_for_session(session_key):
     return drivers_info
 
 
+def get_session_info(session_key):
+    sessions = fetch_api_data("sessions", {"session_key": session_key})
+    return sessions[0] if sessions else None
+
+
 def get_latest_session_info():
     print("Pobieranie informacji o najnowszej sesji...")
     latest_session = fetch_api_data("sessions", {"session_key": "latest"})
@@ -52,7 +180,94 @@ def get_latest_session_info():
     return None
 
 
-def get_historical_session_data(session_key, start_date, end_date):
+def apply_telemetry_schema(frame):
+    """Rzutuje ramkę telemetrii na TELEMETRY_SCHEMA i usuwa stałe kolumny kluczy sesji."""
+    frame = frame.drop(columns=CONSTANT_COLUMNS, errors='ignore')
+    dtypes = {column: dtype for column, dtype in TELEMETRY_SCHEMA.items() if column in frame.columns}
+    int_columns = [column for column, dtype in dtypes.items() if dtype.startswith(('int', 'uint'))]
+    if int_columns:
+        frame[int_columns] = frame[int_columns].fillna(0)
+    return frame.astype(dtypes)
+
+
+def memory_report(frame):
+    """Zużycie pamięci ramki: bajty na kolumnę (z indeksem) oraz suma."""
+    usage = frame.memory_usage(deep=True)
+    report = pd.DataFrame({'kolumna': usage.index, 'typ': [str(frame[c].dtype) if c in frame.columns else '' for c in
+                                                           usage.index], 'bajty': usage.values})
+    return report, int(usage.sum())
+
+
+def _records_to_frame(records, columns):
+    """Buduje ramkę o stałym zestawie kolumn: data jako datetime, pozostałe wartości jako liczby."""
+    frame = pd.DataFrame.from_records(records, columns=columns)
+    frame['date'] = pd.to_datetime(frame['date'], format='ISO8601')
+    for column in columns:
+        if column not in ('date', 'driver_number', 'session_key', 'meeting_key'):
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').astype('float64')
+    return frame
+
+
+def _time_windows(start_date, end_date, window):
+    window_start = start_date
+    while window_start < end_date:
+        window_end = min(window_start + window, end_date)
+        yield window_start, window_end
+        window_start = window_end
+
+
+def iter_session_chunks(session_key, start_date, end_date, window=STREAM_WINDOW):
+    """Generator kolejnych okien czasowych sesji: lokalizacja połączona z car_data, posortowana po dacie.
+
+    W pamięci jest naraz tylko jedno okno, niezależnie od długości sesji. Nieudane pobranie okna przerywa
+    generator wyjątkiem SessionFetchError, aby niekompletna sesja nie trafiła do magazynu.
+    """
+    date_format = '%Y-%m-%dT%H:%M:%S.%f'
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for window_start, window_end in _time_windows(start_date, end_date, window):
+            print(f"--- Pobieranie okna {window_start} - {window_end} ---")
+            location_params = {"session_key": session_key, "date>=": window_start.strftime(date_format),
+                               "date<": window_end.strftime(date_format)}
+            # car_data pobieramy z zapasem równym tolerancji łączenia, aby próbki na granicy okien miały parę.
+            car_params = {"session_key": session_key,
+                          "date>=": (window_start - MERGE_TOLERANCE).strftime(date_format),
+                          "date<": (window_end + MERGE_TOLERANCE).strftime(date_format)}
+            location_future = executor.submit(fetch_api_data, "location", location_params)
+            car_data_future = executor.submit(fetch_api_data, "car_data", car_params)
+            location_records, car_records = location_future.result(), car_data_future.result()
+            if location_records is None or car_records is None:
+                failed = "location" if location_records is None else "car_data"
+                raise SessionFetchError(f"Nie udało się pobrać '{failed}' dla okna {window_start} - {window_end}.")
+            if not location_records:
+                continue
+
+            with instrumentation.span('dataframe_build', rows=len(location_records) + len(car_records or [])):
+                loc_df = _records_to_frame(location_records, LOCATION_COLUMNS).sort_values('date')
+                car_df = _records_to_frame(car_records, CAR_DATA_COLUMNS).sort_values('date') if car_records else None
+            del location_records, car_records
+            if car_df is not None:
+                with instrumentation.span('merge', rows=len(loc_df)):
+                    chunk = pd.merge_asof(loc_df, car_df, on='date', by='driver_number', direction='nearest',
+                                          tolerance=MERGE_TOLERANCE)
+            else:
+                chunk = loc_df.reindex(columns=LOCATION_COLUMNS + CAR_DATA_COLUMNS[2:])
+            yield apply_telemetry_schema(chunk).reset_index(drop=True)
+
+
+def get_historical_session_data(session_key, start_date, end_date, window=None):
+    return _session_flight.do((session_key, start_date, end_date, window),
+                              lambda: _get_historical_session_data(session_key, start_date, end_date, window))
+
+
+def _get_historical_session_data(session_key, start_date, end_date, window):
+    if window is not None:
+        print(f"Rozpoczynanie strumieniowego pobierania danych historycznych (okna po {window}).")
+        chunks = list(iter_session_chunks(session_key, start_date, end_date, window))
+        if not chunks:
+            print("KRYTYCZNY BŁĄD: Nie udało się pobrać ŻADNYCH danych o lokalizacji.")
+            return pd.DataFrame()
+        return apply_telemetry_schema(pd.concat(chunks, ignore_index=True))
+
     print("Rozpoczynanie pobierania danych historycznych - kierowca po kierowcy.")
     drivers = get_drivers_for_session(session_key)
     if not drivers:
@@ -63,34 +278,39 @@ def get_historical_session_data(session_key, start_date, end_date):
     start_time_str = start_date.strftime('%Y-%m-%dT%H:%M:%S')
     end_time_str = end_date.strftime('%Y-%m-%dT%H:%M:%S')
 
-    for driver_number in drivers.keys():
+    def fetch_driver(driver_number):
         print(f"--- Pobieranie danych dla kierowcy nr {driver_number} ---")
         params = {"session_key": session_key, "driver_number": driver_number, "date>": start_time_str,
                   "date<": end_time_str}
+        return fetch_api_data("location", params), fetch_api_data("car_data", params)
 
-        location_chunk = fetch_api_data("location", params)
-        if location_chunk: all_locations.extend(location_chunk)
-
-        car_data_chunk = fetch_api_data("car_data", params)
-        if car_data_chunk: all_car_data.extend(car_data_chunk)
+    # Wyniki składamy w kolejności kierowców, więc wynik jest taki sam jak przy pobieraniu sekwencyjnym.
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for location_chunk, car_data_chunk in executor.map(fetch_driver, drivers.keys()):
+            if location_chunk: all_locations.extend(location_chunk)
+            if car_data_chunk: all_car_data.extend(car_data_chunk)
 
     if not all_locations:
         print("KRYTYCZNY BŁĄD: Nie udało się pobrać ŻADNYCH danych o lokalizacji.")
         return pd.DataFrame()
 
-    loc_df = pd.DataFrame(all_locations)
-    loc_df['date'] = pd.to_datetime(loc_df['date'], format='ISO8601')
+    with instrumentation.span('dataframe_build', rows=len(all_locations) + len(all_car_data)):
+        loc_df = pd.DataFrame(all_locations)
+        loc_df['date'] = pd.to_datetime(loc_df['date'], format='ISO8601')
+        car_df = None
+        if all_car_data:
+            car_df = pd.DataFrame(all_car_data)
+            car_df['date'] = pd.to_datetime(car_df['date'], format='ISO8601')
+            car_df = car_df.drop(columns=['meeting_key', 'session_key'], errors='ignore')
 
-    if all_car_data:
-        car_df = pd.DataFrame(all_car_data)
-        car_df['date'] = pd.to_datetime(car_df['date'], format='ISO8601')
-        car_df = car_df.drop(columns=['meeting_key', 'session_key'], errors='ignore')
-        combined_df = pd.merge_asof(loc_df.sort_values('date'), car_df.sort_values('date'), on='date',
-                                    by='driver_number', direction='nearest', tolerance=pd.Timedelta('1s'))
+    if car_df is not None:
+        with instrumentation.span('merge', rows=len(loc_df)):
+            combined_df = pd.merge_asof(loc_df.sort_values('date'), car_df.sort_values('date'), on='date',
+                                        by='driver_number', direction='nearest', tolerance=MERGE_TOLERANCE)
     else:
         combined_df = loc_df
 
-    return combined_df.sort_values('date').reset_index(drop=True)
+    return apply_telemetry_schema(combined_df).sort_values('date').reset_index(drop=True)
 
 
 def get_live_data(start_date):
@@ -125,9 +345,16 @@ def get_live_data(start_date):
                 direction='nearest',
                 tolerance=pd.Timedelta('2s')
             )
-            return combined_df, session_key
+            return apply_telemetry_schema(combined_df), session_key
+
+    return apply_telemetry_schema(loc_df), session_key
+
 
-    return loc_df, session_key
+def get_live_frame(endpoint, since, session_key='latest'):
+    """Nowe rekordy `location` albo `car_data` z datą późniejszą niż `since`, jako ramka o stałych kolumnach."""
+    columns = LOCATION_COLUMNS if endpoint == "location" else CAR_DATA_COLUMNS
+    records = fetch_api_data(endpoint, {'session_key': session_key, 'date>': since.strftime('%Y-%m-%dT%H:%M:%S.%f')})
+    return _records_to_frame(records or [], columns)
 
 
 def get_laps_for_session(session_key):
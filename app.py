@@ -1,81 +1,198 @@
-import io
 import time
-from datetime import timedelta
 
-import matplotlib.pyplot as plt
 import pandas as pd
-import plotly.graph_objects as go
 import streamlit as st
-from PIL import Image, ImageDraw, ImageFont
-from plotly.subplots import make_subplots
+import streamlit.components.v1 as components
 
 import api_client
+import client_playback
+import frame_engine
+import frame_pipeline
+import instrumentation
+import lap_index
+import live_ingest
+import session_artifacts
+import session_registry
+import session_store
+import telemetry_charts
+import track_renderer
 
 st.set_page_config(layout="wide", page_title="F1 Telemetry Viewer")
+script_started = time.perf_counter()
 
 
+@instrumentation.counted('meetings')
 @st.cache_data(ttl=3600)
 def cached_get_meetings(year):
-    meetings = api_client.get_meetings(year)
-    return pd.DataFrame(meetings) if meetings else pd.DataFrame()
+    instrumentation.count('meetings.miss')
+    return session_artifacts.load_meetings(year)
 
 
+@instrumentation.counted('sessions')
 @st.cache_data(ttl=3600)
 def cached_get_sessions(meeting_key):
-    sessions = api_client.get_sessions(meeting_key)
-    return pd.DataFrame(sessions) if sessions else pd.DataFrame()
+    instrumentation.count('sessions.miss')
+    return session_artifacts.load_sessions(meeting_key)
 
 
+@instrumentation.counted('drivers')
 @st.cache_data(ttl=3600)
-def cached_get_drivers(session_key): return api_client.get_drivers_for_session(session_key)
-
-
-@st.cache_data(ttl=3600, show_spinner="Pobieranie pełnych danych sesji...")
-def get_and_cache_session_data(session_key, start_date, end_date):
-    data = api_client.get_historical_session_data(session_key, start_date, end_date)
-    if not data.empty: data.dropna(subset=['x', 'y', 'date'], inplace=True)
-    return data
-
-
-@st.cache_data(show_spinner="Przetwarzanie danych do animacji...")
-def prepare_animation_data(full_data):
-    timestamps = sorted(full_data['date'].unique())
-    drivers = sorted(full_data['driver_number'].unique())
-    complete_index = pd.MultiIndex.from_product([timestamps, drivers], names=['date', 'driver_number'])
-    animation_df = full_data.set_index(['date', 'driver_number']).reindex(complete_index)
-    animation_df = animation_df.groupby(level='driver_number').fillna(method='ffill')
-    animation_df.dropna(inplace=True)
-    return animation_df.reset_index()
-
-
-@st.cache_data(ttl=3600, show_spinner="Pobieranie danych o okrążeniach...")
-def get_laps_data(session_key):
-    return api_client.get_laps_for_session(session_key)
-
-
-@st.cache_data(show_spinner="Generowanie tła toru (tylko raz)...")
-def generate_track_background_image(full_data):
-    track_extents = {'min_x': full_data['x'].min(), 'max_x': full_data['x'].max(), 'min_y': full_data['y'].min(),
-                     'max_y': full_data['y'].max()}
-    min_x, max_x, min_y, max_y = track_extents.values()
-    range_x, range_y = max_x - min_x, max_y - min_y
-    ref_driver_num = full_data['driver_number'].iloc[0]
-    track_line_data = full_data[full_data['driver_number'] == ref_driver_num].sort_values('date')
-    fig, ax = plt.subplots(figsize=(10, 10 * (range_y / range_x if range_x != 0 else 1)))
-    ax.plot(track_line_data['x'], track_line_data['y'], color='#444444', linewidth=5, solid_capstyle='round')
-    ax.set_facecolor("#0E1117")
-    ax.set_aspect('equal')
-    ax.set_xlim(min_x, max_x)
-    ax.set_ylim(min_y, max_y)
-    plt.axis('off')
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight', pad_inches=0, dpi=200)
-    plt.close(fig)
-    buf.seek(0)
-    return Image.open(buf), track_extents
+def cached_get_drivers(session_key, end_date):
+    instrumentation.count('drivers.miss')
+    return session_artifacts.load_drivers(session_key, end_date)
+
+
+@instrumentation.counted('session_load')
+@st.cache_resource(ttl=3600, max_entries=4, show_spinner="Pobieranie pełnych danych sesji...")
+def load_session_dataset(session_key, start_date, end_date):
+    instrumentation.count('session_load.miss')
+    data, laps = session_artifacts.load_session_data(session_key, start_date, end_date)
+    return session_registry.register(session_key, data, laps)
+
+
+# Funkcje pochodne przyjmują lekki klucz zestawu danych zamiast wielomilionowej ramki, którą Streamlit
+# musiałby haszować przy każdym przebiegu skryptu.
+@instrumentation.counted('animation_prep')
+@st.cache_resource(max_entries=8, show_spinner="Przetwarzanie danych do animacji...")
+def prepare_animation_data(dataset_key, frame_rate):
+    dataset = session_registry.get(dataset_key)
+    with instrumentation.cache_miss('animation_prep', frame_rate=frame_rate):
+        return session_artifacts.load_frame_array(dataset.session_key, dataset.telemetry, frame_rate)
+
+
+@instrumentation.counted('track_image')
+@st.cache_resource(max_entries=8, show_spinner="Generowanie tła toru (tylko raz)...")
+def generate_track_background_image(dataset_key, circuit_name):
+    with instrumentation.cache_miss('track_image'):
+        dataset = session_registry.get(dataset_key)
+        outline, extents = session_artifacts.load_track_outline(circuit_name, dataset.session_key,
+                                                                get_lap_index(dataset_key))
+        if outline is None:
+            return track_renderer.render_track_background(dataset.telemetry)
+        return track_renderer.rasterize_track(outline, extents), extents
+
+
+@instrumentation.counted('lap_index')
+@st.cache_resource(max_entries=4, show_spinner="Indeksowanie okrążeń...")
+def get_lap_index(dataset_key):
+    dataset = session_registry.get(dataset_key)
+    with instrumentation.cache_miss('lap_index'):
+        return session_artifacts.load_lap_index(dataset.session_key, dataset.laps, dataset.telemetry)
+
+
+@st.cache_resource(max_entries=512)
+def get_lap_traces(dataset_key, driver_number, lap_position):
+    return telemetry_charts.lap_traces(get_lap_index(dataset_key), driver_number, lap_position)
+
+
+@instrumentation.counted('lap_chart')
+@st.cache_resource(max_entries=64)
+def get_lap_figure(dataset_key, driver_number, lap_position):
+    with instrumentation.cache_miss('lap_chart'):
+        traces = get_lap_traces(dataset_key, driver_number, lap_position)
+        return telemetry_charts.lap_figure(traces) if traces is not None else None
+
+
+@st.cache_resource(max_entries=16)
+def get_overlay_figure(dataset_key, selections, labels):
+    traces = [get_lap_traces(dataset_key, driver_number, position) for driver_number, position in selections]
+    available = [(trace, label) for trace, label in zip(traces, labels) if trace is not None]
+    return telemetry_charts.overlay_figure(*zip(*available)) if available else None
+
+
+@st.cache_resource(max_entries=8)
+def get_track_renderer(dataset_key, _base_image, _track_extents, _drivers):
+    return track_renderer.TrackRenderer(_base_image, _track_extents, _drivers)
+
+
+@st.cache_data(ttl=60)
+def cached_get_latest_session():
+    return api_client.get_latest_session_info()
+
+
+# Poller sam kończy pracę, gdy nikt nie ogląda (live_ingest.IDLE_TIMEOUT); zatrzymany jest tworzony od nowa.
+@st.cache_resource(max_entries=1)
+def get_live_poller(session_key):
+    return live_ingest.LivePoller(session_key).start()
+
+
+@st.cache_resource(show_spinner="Generowanie tła toru na żywo...")
+def get_live_track_renderer(session_key, generation, _poller, _drivers):
+    base_image, extents = track_renderer.render_track_background(_poller.history())
+    return track_renderer.TrackRenderer(base_image, extents, _drivers)
+
+
+@st.cache_resource
+def get_frame_pipeline():
+    return frame_pipeline.FramePipeline()
+
+
+@instrumentation.counted('playback_html')
+@st.cache_data(max_entries=8, show_spinner="Przygotowywanie okna odtwarzania...")
+def get_playback_html(session_key, frame_rate, window_start, driver_numbers, map_mode, frame_duration_ms, _frames,
+                      _drivers, _renderer):
+    with instrumentation.cache_miss('playback_html'):
+        figure = client_playback.build_playback_figure(_frames, window_start, list(driver_numbers), _drivers,
+                                                       _renderer, map_mode, frame_duration_ms)
+        return client_playback.playback_html(figure)
+
+
+def show_performance_panel():
+    # Ciało expandera wykonuje się przy każdym przebiegu (także co klatkę odtwarzania), więc statystyki
+    # liczymy dopiero na żądanie.
+    with st.sidebar.expander("Wydajność"):
+        if not st.toggle("Pokaż statystyki", key="performance_stats_toggle"):
+            return
+        previous_runs = instrumentation.events('script_run')
+        if previous_runs:
+            st.caption(f"Poprzedni przebieg skryptu: **{previous_runs[-1]['ms']:.0f} ms**")
+        st.dataframe(instrumentation.summary().round(1), hide_index=True, use_container_width=True)
+        st.dataframe(instrumentation.cache_stats().round(2), hide_index=True, use_container_width=True)
+        # Eksport powstaje dopiero po kliknięciu (funkcja zamiast gotowych danych), a samo pobranie nie
+        # uruchamia ponownie skryptu.
+        st.download_button("Pobierz zdarzenia (JSON Lines)", instrumentation.to_jsonl,
+                           file_name="f1_instrumentation.jsonl", mime="application/x-ndjson", on_click="ignore")
 
 
 st.title("F1 Telemetry Viewer 🏎️")
+if st.sidebar.toggle("Tryb na żywo (najnowsza sesja)", key="live_mode_toggle"):
+    latest_session = cached_get_latest_session()
+    if not latest_session: st.error("Brak informacji o najnowszej sesji."); st.stop()
+    live_session_key = latest_session['session_key']
+    live_drivers = cached_get_drivers(live_session_key, pd.to_datetime(latest_session['date_end']))
+    poller = get_live_poller(live_session_key)
+    if not poller.is_running:
+        get_live_poller.clear()
+        poller = get_live_poller(live_session_key)
+    st.header(f"Na żywo: {latest_session.get('circuit_short_name')} - {latest_session.get('session_name')}",
+              anchor=False)
+    if not poller.sample_count:
+        st.info("Oczekiwanie na pierwsze dane na żywo...")
+    else:
+        live_map_mode = st.radio("Tryb wizualizacji mapy:", ["Kolory Zespołów", "Biegi i Hamowanie"],
+                                 horizontal=True, key="live_map_mode_radio")
+        # Tło toru odświeżamy kilka razy, gdy bufory zapełniają się pierwszymi okrążeniami.
+        track_generation = min(poller.sample_count // (5 * live_ingest.RING_CAPACITY), 5)
+        live_renderer = get_live_track_renderer(live_session_key, track_generation, poller, live_drivers)
+        live_frame = poller.latest_frame()
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            st.image(live_renderer.render(live_frame, live_map_mode), use_container_width=True)
+            lag = (pd.Timestamp.now(tz='UTC') - poller.last_sample_time).total_seconds()
+            st.caption(f"Opóźnienie względem ostatniej próbki: {lag:.1f} s | "
+                       f"Ostatnie odpytanie API: {poller.last_poll_seconds * 1000:.0f} ms")
+        with col2:
+            st.subheader("Panel Analityczny", anchor=False)
+            live_table = live_frame.assign(Kierowca=live_frame['driver_number'].map(
+                lambda x: live_drivers.get(int(x), {}).get('name_acronym', 'N/A'))).rename(
+                columns={'speed': 'Prędkość (km/h)', 'n_gear': 'Bieg', 'throttle': 'Gaz (%)', 'brake': 'Hamulec (%)'})
+            st.dataframe(live_table[['Kierowca', 'Prędkość (km/h)', 'Bieg', 'Gaz (%)', 'Hamulec (%)']],
+                         hide_index=True, use_container_width=True)
+    show_performance_panel()
+    instrumentation.record('script_run', (time.perf_counter() - script_started) * 1000, live=True)
+    time.sleep(poller.poll_interval)
+    st.rerun()
+
 with st.sidebar:
     st.header("Ustawienia Sesji")
     selected_year = st.selectbox("Wybierz rok:", [2025, 2024, 2023])
@@ -95,7 +212,9 @@ with st.sidebar:
     session_key, circuit_name, session_start_date, session_end_date = session_info['session_key'], session_info[
         'circuit_short_name'], session_info['date_start'], pd.to_datetime(session_info['date_end'])
     st.success(f"Wybrano: **{selected_session_name}**")
-    drivers = cached_get_drivers(session_key)
+    if session_store.OFFLINE:
+        st.caption("Tryb offline: dane wyłącznie z lokalnego magazynu.")
+    drivers = cached_get_drivers(session_key, session_end_date)
     if drivers:
         st.header("Filtruj Kierowców")
         driver_names = sorted([d['full_name'] for d in drivers.values()])
@@ -107,18 +226,34 @@ with st.sidebar:
         else:
             selected_driver_numbers = [num for num, details in drivers.items() if
                                        details['full_name'] in selected_drivers_list]
+    frame_rate = st.select_slider("Częstotliwość klatek (Hz):", options=[4, 5, 8, 10],
+                                  value=frame_engine.DEFAULT_FRAME_RATE)
 
 if not session_key or not drivers: st.stop()
-raw_data = get_and_cache_session_data(session_key, session_start_date, session_end_date)
-laps_data = get_laps_data(session_key)
+try:
+    session_dataset = load_session_dataset(session_key, session_start_date, session_end_date)
+except api_client.SessionFetchError as e:
+    st.error(f"Pobieranie danych sesji nie powiodło się: {e} Spróbuj ponownie później."); st.stop()
+dataset_key = session_dataset.key
+raw_data = session_dataset.telemetry
 if raw_data.empty: st.error("Brak danych o lokalizacji dla tej sesji."); st.stop()
-animation_data = prepare_animation_data(raw_data)
-base_track_image, track_extents = generate_track_background_image(raw_data)
+with st.sidebar.expander("Zużycie pamięci"):
+    memory_df, memory_total = api_client.memory_report(raw_data)
+    st.caption(f"Telemetria: **{memory_total / 1024 ** 2:.1f} MB** ({len(raw_data)} wierszy)")
+    st.dataframe(memory_df, hide_index=True, use_container_width=True)
+animation_frames = prepare_animation_data(dataset_key, frame_rate)
+laps_index = get_lap_index(dataset_key)
+base_track_image, track_extents = generate_track_background_image(dataset_key, circuit_name)
 if 'current_session_key' not in st.session_state or st.session_state.current_session_key != session_key:
     st.session_state.current_session_key = session_key
     st.session_state.playing = False
     st.session_state.current_frame = 0
-timestamps = sorted(animation_data['date'].unique())
+    st.session_state.pop('current_timestamp', None)
+if st.session_state.get('current_frame_rate') != frame_rate:
+    # Indeks klatki zależy od częstotliwości, więc po jej zmianie odnajdujemy klatkę z tą samą chwilą sesji.
+    if 'current_timestamp' in st.session_state:
+        st.session_state.current_frame = animation_frames.frame_index(st.session_state.current_timestamp)
+    st.session_state.current_frame_rate = frame_rate
 st.header("Panel Odtwarzania Animacji", anchor=False)
 cols = st.columns([1, 1, 3])
 if cols[0].button('❚❚ Pause' if st.session_state.playing else '► Play',
@@ -128,7 +263,13 @@ if cols[1].button('↩ Reset',
 speed_options = {0.5: 'Bardzo Wolno', 0.2: 'Wolno', 0.1: 'Normalna', 0.05: 'Szybko', 0.01: 'Bardzo Szybko'}
 playback_delay = cols[2].select_slider('Prędkość odświeżania', options=list(speed_options.keys()), value=0.05,
                                        format_func=lambda x: speed_options.get(x))
-st.session_state.current_frame = st.slider("Oś czasu", 0, len(timestamps) - 1, st.session_state.current_frame,
+playback_mode = st.radio("Tryb odtwarzania:", ["Serwer (klatka po klatce)", "Przeglądarka (płynnie)"],
+                         horizontal=True, key="playback_mode_radio")
+client_side_playback = playback_mode == "Przeglądarka (płynnie)"
+if client_side_playback:
+    st.session_state.playing = False
+st.session_state.current_frame = min(st.session_state.current_frame, len(animation_frames) - 1)
+st.session_state.current_frame = st.slider("Oś czasu", 0, len(animation_frames) - 1, st.session_state.current_frame,
                                            on_change=lambda: st.session_state.update(playing=False))
 
 with st.container(border=True):
@@ -171,106 +312,92 @@ with st.container(border=True):
                </div>
                """, unsafe_allow_html=True)
 
-current_timestamp = timestamps[st.session_state.current_frame]
-data_for_moment = animation_data[animation_data['date'] == current_timestamp]
-data_to_display = data_for_moment[data_for_moment['driver_number'].isin(selected_driver_numbers)]
-frame_image = base_track_image.copy()
-draw = ImageDraw.Draw(frame_image, 'RGBA')
-img_width, img_height = frame_image.size
-min_x, max_x, min_y, max_y = track_extents.values()
-range_x, range_y = max_x - min_x, max_y - min_y
-try:
-    font = ImageFont.truetype("arialbd.ttf", 22)
-except IOError:
-    font = ImageFont.load_default()
-GEAR_COLORS = ['#FFFFFF', '#FF0000', '#FF4500', '#FF8C00', '#FFD700', '#ADFF2F', '#00FF00', '#00BFFF', '#1E90FF']
-if not data_to_display.empty and range_x > 0 and range_y > 0:
-    for _, driver_row in data_to_display.iterrows():
-        x_frac = (driver_row['x'] - min_x) / range_x
-        y_frac = (driver_row['y'] - min_y) / range_y
-        px = x_frac * img_width
-        py = img_height - (y_frac * img_height)
-        radius = 12
-        driver_info = drivers.get(int(driver_row['driver_number']), {})
-        if map_mode == "Biegi i Hamowanie":
-            dot_color = GEAR_COLORS[int(driver_row.get('n_gear', 0))]
-            if driver_row.get('brake', 0) > 50:
-                brake_radius = radius + 8
-                draw.ellipse([px - brake_radius, py - brake_radius, px + brake_radius, py + brake_radius],
-                             fill=(255, 20, 20, 200))
-        else:
-            dot_color = driver_info.get('team_colour', '#FFFFFF')
-        draw.ellipse([px - radius, py - radius, px + radius, py + radius], fill=dot_color, outline='black', width=2)
-        acronym = driver_info.get('name_acronym', '')
-        text_anchor_point = (px, py - radius - 12)
-        text_bbox = draw.textbbox(text_anchor_point, acronym, font=font, anchor="ms")
-        rect_padding = 4
-        rect_bbox = [text_bbox[0] - rect_padding, text_bbox[1] - rect_padding, text_bbox[2] + rect_padding,
-                     text_bbox[3] + rect_padding]
-        draw.rectangle(rect_bbox, fill=(0, 0, 0, 160))
-        draw.text(text_anchor_point, acronym, fill="white", font=font, anchor="ms")
+current_timestamp = animation_frames.timestamp(st.session_state.current_frame)
+st.session_state.current_timestamp = current_timestamp
+data_to_display = animation_frames.frame(st.session_state.current_frame, selected_driver_numbers)
+renderer = get_track_renderer(dataset_key, base_track_image, track_extents, drivers)
+pipeline = get_frame_pipeline()
+
+
+def frame_job(frame_index, frames=animation_frames, frame_renderer=renderer, mode=map_mode,
+              selected=tuple(selected_driver_numbers)):
+    key = (session_key, frame_rate, frame_index, mode, selected)
+    return key, lambda: frame_pipeline.encode_frame(frame_renderer.render(frames.frame(frame_index, selected), mode))
+
+
+frame_image, frame_render_ms = None, 0.0
+if not client_side_playback:
+    frame_image, frame_render_ms = pipeline.get(*frame_job(st.session_state.current_frame))
+    pipeline.prefetch(frame_job(i) for i in range(st.session_state.current_frame + 1, min(
+        st.session_state.current_frame + 1 + frame_pipeline.LOOKAHEAD, len(animation_frames))))
 
 col1, col2 = st.columns([2, 1])
 with col1:
     st.subheader(f"Mapa Toru: {circuit_name}", anchor=False)
-    st.image(frame_image, use_container_width=True)
+    if client_side_playback:
+        window_start = st.session_state.current_frame
+        components.html(get_playback_html(session_key, frame_rate, window_start, tuple(selected_driver_numbers),
+                                          map_mode, playback_delay * 1000, animation_frames, drivers, renderer),
+                        height=700)
+        window_end = min(window_start + client_playback.PLAYBACK_WINDOW, len(animation_frames)) - 1
+        st.caption(f"Okno odtwarzania: {animation_frames.timestamp(window_start).strftime('%H:%M:%S')} - "
+                   f"{animation_frames.timestamp(window_end).strftime('%H:%M:%S')}. "
+                   f"Przesuń oś czasu, aby wczytać inne okno.")
+        if window_end < len(animation_frames) - 1 and st.button("Następne okno ▶"):
+            st.session_state.current_frame = window_end + 1
+            st.rerun()
+    else:
+        st.image(frame_image, use_container_width=True)
+        pipeline_metrics = pipeline.metrics()
+        st.caption(f"Czas renderowania klatki: {frame_render_ms:.1f} ms | "
+                   f"Trafienia cache klatek: {pipeline_metrics['hit_rate']:.0%} | "
+                   f"Kolejka: {pipeline_metrics['queue_depth']}")
+panel_started = time.perf_counter()
 with col2:
     st.subheader("Panel Analityczny", anchor=False)
     st.info(f"Czas sesji: **{pd.to_datetime(current_timestamp).strftime('%H:%M:%S.%f')[:-3]}**")
 
     if len(selected_driver_numbers) == 1:
         driver_num = selected_driver_numbers[0]
-        driver_laps = laps_data[laps_data['driver_number'] == driver_num].sort_values(by='lap_number')
-        current_lap_data = driver_laps[driver_laps['date_start'] <= current_timestamp].tail(1)
-        if not current_lap_data.empty:
-            current_lap = current_lap_data.iloc[0]
+        current_lap_position = laps_index.current_lap_position(driver_num, current_timestamp)
+        if current_lap_position is not None:
+            current_lap = laps_index.laps.iloc[current_lap_position]
             lap_number = int(current_lap['lap_number'])
             st.markdown(
                 f"**Analiza Kierowcy: {drivers.get(driver_num, {}).get('full_name')} | Okrążenie: {lap_number}**")
 
             with st.expander("Telemetria Bieżącego Okrążenia", expanded=True):
-                lap_start = current_lap['date_start']
-                lap_end = lap_start + timedelta(seconds=current_lap.get('lap_duration', 300))
-                telemetry_data = raw_data[
-                    (raw_data['driver_number'] == driver_num) & (raw_data['date'] >= lap_start) & (
-                            raw_data['date'] <= lap_end)].copy()
-                if not telemetry_data.empty:
-                    telemetry_data['time_delta'] = (telemetry_data['date'] - lap_start).dt.total_seconds()
-                    fig = make_subplots(rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.05,
-                                        subplot_titles=("Prędkość", "Gaz / Hamulec", "Obroty", "Bieg"))
-                    fig.add_trace(
-                        go.Scatter(x=telemetry_data['time_delta'], y=telemetry_data['speed'], name='Prędkość'), row=1,
-                        col=1)
-                    fig.add_trace(go.Scatter(x=telemetry_data['time_delta'], y=telemetry_data['throttle'], name='Gaz',
-                                             line=dict(color='green')), row=2, col=1)
-                    fig.add_trace(go.Scatter(x=telemetry_data['time_delta'], y=telemetry_data['brake'], name='Hamulec',
-                                             line=dict(color='red')), row=2, col=1)
-                    fig.add_trace(go.Scatter(x=telemetry_data['time_delta'], y=telemetry_data['rpm'], name='RPM'),
-                                  row=3, col=1)
-                    fig.add_trace(go.Scatter(x=telemetry_data['time_delta'], y=telemetry_data['n_gear'], name='Bieg',
-                                             mode='lines', line=dict(shape='hv')), row=4, col=1)
-                    current_time_delta = (current_timestamp - lap_start).total_seconds()
-                    fig.add_vline(x=current_time_delta, line_width=2, line_dash="dash", line_color="white")
-                    fig.update_layout(height=450, template="plotly_dark", showlegend=False,
-                                      margin=dict(l=20, r=20, t=40, b=20))
-                    st.plotly_chart(fig, use_container_width=True)
+                # Figura okrążenia powstaje raz; co klatkę zmienia się tylko pozycja kursora.
+                lap_figure = get_lap_figure(dataset_key, driver_num, current_lap_position)
+                if lap_figure is not None:
+                    current_time_delta = (current_timestamp - current_lap['date_start']).total_seconds()
+                    st.plotly_chart(telemetry_charts.with_cursor(lap_figure, current_time_delta),
+                                    use_container_width=True)
+
+            with st.expander("Porównanie okrążeń (wg dystansu)"):
+                compared_laps = st.multiselect(
+                    "Okrążenia kierowcy:", laps_index.driver_laps(driver_num)['lap_number'].astype(int).tolist(),
+                    default=[lap_number], key="compare_laps")
+                compared_drivers = st.multiselect(
+                    "Najszybsze okrążenia kierowców:", [num for num in drivers if num != driver_num],
+                    format_func=lambda num: drivers[num].get('name_acronym', str(num)), key="compare_drivers")
+                selections, labels = [], []
+                for compared_lap in compared_laps:
+                    selections.append((driver_num, laps_index.lap_position(driver_num, compared_lap)))
+                    labels.append(f"{drivers.get(driver_num, {}).get('name_acronym', driver_num)} okr. {compared_lap}")
+                for compared_driver in compared_drivers:
+                    fastest = laps_index.fastest_lap_position(compared_driver)
+                    if fastest is not None:
+                        selections.append((compared_driver, fastest))
+                        labels.append(f"{drivers[compared_driver].get('name_acronym', compared_driver)} okr. "
+                                      f"{int(laps_index.laps['lap_number'].iloc[fastest])}")
+                overlay = get_overlay_figure(dataset_key, tuple(selections), tuple(labels)) if selections else None
+                if overlay is not None:
+                    st.plotly_chart(overlay, use_container_width=True)
 
             with st.expander("Analiza Sektorów (vs poprzednie okrążenie)", expanded=True):
-                previous_lap = driver_laps[driver_laps['lap_number'] == lap_number - 1]
-
-
-                def format_sector(s_num, c_lap, p_lap):
-                    c_time = c_lap.get(f'duration_sector_{s_num}')
-                    if pd.isna(c_time): return "---"
-                    p_time = p_lap.iloc[0].get(f'duration_sector_{s_num}') if not p_lap.empty else None
-                    emoji = "🟢" if pd.notna(p_time) and c_time < p_time else ("🟡" if pd.notna(p_time) else "")
-                    return f"{c_time:.3f}s {emoji}"
-
-
-                st.dataframe([{"Okr.": lap_number, "S1": format_sector(1, current_lap, previous_lap),
-                               "S2": format_sector(2, current_lap, previous_lap),
-                               "S3": format_sector(3, current_lap, previous_lap)}], hide_index=True,
-                             use_container_width=True)
+                st.dataframe(laps_index.sectors.iloc[[current_lap_position]][lap_index.SECTOR_TABLE_COLUMNS],
+                             hide_index=True, use_container_width=True)
         else:
             st.info("Oczekiwanie na pierwsze okrążenie pomiarowe...")
     else:
@@ -296,34 +423,20 @@ with col2:
                 use_container_width=True
             )
         with st.expander("Analiza Sektorów (vs poprzednie okrążenie)", expanded=True):
-            if not laps_data.empty:
-                sector_data = []
-                for driver_num in selected_driver_numbers:
-                    driver_laps = laps_data[laps_data['driver_number'] == driver_num].sort_values(by='lap_number')
-                    current_lap_data = driver_laps[driver_laps['date_start'] <= current_timestamp].tail(1)
-                    if not current_lap_data.empty:
-                        current_lap = current_lap_data.iloc[0]
-                        lap_number = int(current_lap['lap_number'])
-                        previous_lap = driver_laps[driver_laps['lap_number'] == lap_number - 1]
-
-
-                        def format_sector(s_num, c_lap, p_lap):
-                            c_time = c_lap.get(f'duration_sector_{s_num}')
-                            if pd.isna(c_time): return "---"
-                            p_time = p_lap.iloc[0].get(f'duration_sector_{s_num}') if not p_lap.empty else None
-                            emoji = "🟢" if pd.notna(p_time) and c_time < p_time else ("🟡" if pd.notna(p_time) else "")
-                            return f"{c_time:.3f}s {emoji}"
-
-
-                        sector_data.append(
-                            {"Kierowca": drivers.get(driver_num, {}).get('name_acronym', str(driver_num)),
-                             "Okr.": lap_number, "S1": format_sector(1, current_lap, previous_lap),
-                             "S2": format_sector(2, current_lap, previous_lap),
-                             "S3": format_sector(3, current_lap, previous_lap)})
-                if sector_data: st.dataframe(pd.DataFrame(sector_data), hide_index=True, use_container_width=True)
+            sector_data = laps_index.current_sectors(selected_driver_numbers, current_timestamp)
+            if not sector_data.empty:
+                sector_data = sector_data[lap_index.SECTOR_TABLE_COLUMNS].assign(
+                    Kierowca=sector_data['driver_number'].map(
+                        lambda x: drivers.get(int(x), {}).get('name_acronym', str(x))))
+                st.dataframe(sector_data[['Kierowca'] + lap_index.SECTOR_TABLE_COLUMNS], hide_index=True,
+                             use_container_width=True)
+instrumentation.record('analytics_panel', (time.perf_counter() - panel_started) * 1000)
 
+show_performance_panel()
+instrumentation.record('script_run', (time.perf_counter() - script_started) * 1000,
+                       playing=bool(st.session_state.playing))
 if st.session_state.playing:
-    if st.session_state.current_frame < len(timestamps) - 1:
+    if st.session_state.current_frame < len(animation_frames) - 1:
         st.session_state.current_frame += 1
     else:
         st.session_state.playing = False
@@ -0,0 +1,142 @@
+"""Benchmark etapów przetwarzania na syntetycznej sesji serwowanej przez lokalny zamiennik API.
+
+Uruchomienie z katalogu repozytorium: python -m benchmarks.run --output bench_results.json
+Wynik (JSON) zawiera dla każdego etapu czas (najlepszy i mediana z powtórzeń) oraz szczytowe zużycie pamięci
+zmierzone osobnym przebiegiem pod tracemalloc.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import platform
+import socket
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import api_client
+import frame_engine
+import lap_index
+import track_renderer
+from benchmarks import stub_server, synthetic
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def measure(results, stage, fn, repeat=1, items=None, quiet=True):
+    """Mierzy `fn`: czasy z `repeat` przebiegów, potem szczyt pamięci z jednego przebiegu pod tracemalloc."""
+    output = io.StringIO() if quiet else sys.stdout
+    timings, result = [], None
+    with contextlib.redirect_stdout(output):
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - started)
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    record = {'stage': stage, 'seconds': min(timings), 'seconds_median': statistics.median(timings),
+              'repeat': repeat, 'peak_mb': peak / 2 ** 20}
+    if items:
+        record['items'] = items
+        record['ms_per_item'] = record['seconds'] * 1000 / items
+    results.append(record)
+    print(f"{stage:<40} {record['seconds']:>9.3f} s {record['peak_mb']:>9.1f} MB"
+          + (f" {record['ms_per_item']:>8.2f} ms/szt." if items else ""))
+    return result
+
+
+def run(args):
+    results = []
+    start = synthetic.SESSION_START
+    end = start + pd.Timedelta(seconds=args.duration)
+    session_key = synthetic.SESSION_KEY
+
+    measure(results, 'fetch_api_data', lambda: api_client.fetch_api_data(
+        "location", {"session_key": session_key, "driver_number": synthetic.DRIVER_NUMBERS[0]}), args.repeat)
+    telemetry = measure(results, 'get_historical_session_data',
+                        lambda: api_client.get_historical_session_data(session_key, start, end))
+    measure(results, 'get_historical_session_data (okna)',
+            lambda: api_client.get_historical_session_data(session_key, start, end, api_client.STREAM_WINDOW))
+    telemetry = telemetry.dropna(subset=['x', 'y', 'date'])
+    laps = measure(results, 'get_laps_for_session', lambda: api_client.get_laps_for_session(session_key))
+    with contextlib.redirect_stdout(io.StringIO()):
+        drivers = api_client.get_drivers_for_session(session_key)
+
+    frames = measure(results, 'prepare_animation_data',
+                     lambda: frame_engine.build_frame_array(telemetry, frame_engine.DEFAULT_FRAME_RATE), args.repeat)
+    measure(results, 'render_track_background (matplotlib)', lambda: track_renderer.render_track_background(telemetry))
+    index = measure(results, 'lap_index', lambda: lap_index.LapIndex(laps, telemetry))
+    outline, extents = measure(results, 'build_track_outline', lambda: track_renderer.build_track_outline(index),
+                               args.repeat)
+    base_image = measure(results, 'rasterize_track', lambda: track_renderer.rasterize_track(outline, extents),
+                         args.repeat)
+
+    frame_indices = np.linspace(0, len(frames) - 1, args.frames).astype(int)
+    renderer = track_renderer.TrackRenderer(base_image, extents, drivers)
+    for map_mode in ("Kolory Zespołów", "Biegi i Hamowanie"):
+        measure(results, f'render_frame ({map_mode})',
+                lambda: [renderer.render(frames.frame(i), map_mode) for i in frame_indices], args.repeat,
+                items=len(frame_indices))
+
+    driver_numbers = list(drivers.keys())
+
+    def panels():
+        for i in frame_indices:
+            timestamp = frames.timestamp(i)
+            index.current_sectors(driver_numbers, timestamp)
+            position = index.current_lap_position(driver_numbers[0], timestamp)
+            if position is not None:
+                index.lap_telemetry(driver_numbers[0], position)
+
+    measure(results, 'analytics_panels', panels, args.repeat, items=len(frame_indices))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark etapów F1 Telemetry Viewer na danych syntetycznych.")
+    parser.add_argument('--drivers', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=7200.0, help="Długość sesji w sekundach.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--frames', type=int, default=200, help="Liczba klatek w etapach renderowania i paneli.")
+    parser.add_argument('--repeat', type=int, default=3, help="Powtórzenia szybkich etapów.")
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    port = _free_port()
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    server = context.Process(target=stub_server.serve, args=(port, args.drivers, args.duration, args.seed, ready),
+                             daemon=True)
+    server.start()
+    try:
+        if not ready.wait(timeout=600):
+            raise RuntimeError("Serwer testowy nie wystartował.")
+        api_client.API_BASE_URL = f"http://127.0.0.1:{port}/v1"
+        # Lokalnego serwera nie ograniczamy - mierzymy koszt przetwarzania, a nie limit zapytań.
+        api_client.set_rate_limit(0)
+        results = run(args)
+    finally:
+        server.terminate()
+
+    report = {'meta': {'drivers': args.drivers, 'duration': args.duration, 'seed': args.seed, 'frames': args.frames,
+                       'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                       'timestamp': pd.Timestamp.now(tz='UTC').isoformat()},
+              'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Zapisano wyniki do {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Lokalny zamiennik API OpenF1 serwujący dane z benchmarks.synthetic.
+
+Uruchomienie: python -m benchmarks.stub_server --port 8001
+a następnie OPENF1_API_URL=http://127.0.0.1:8001/v1 streamlit run app.py
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+
+from benchmarks import synthetic
+
+DATE_COLUMNS = {'location': 'date', 'car_data': 'date', 'laps': 'date_start'}
+COMPARISONS = {'>=': 'ge', '<=': 'le', '>': 'gt', '<': 'lt'}
+
+
+class StubData:
+    """Dane endpointów z wstępnie policzonymi znacznikami czasu do filtrowania po zakresie dat."""
+
+    def __init__(self, frames):
+        self.frames = {}
+        self.times = {}
+        for endpoint, frame in frames.items():
+            date_column = DATE_COLUMNS.get(endpoint)
+            if date_column:
+                frame = frame.sort_values(date_column, kind='stable').reset_index(drop=True)
+                self.times[endpoint] = frame[date_column].dt.as_unit('ns').astype('int64')
+                frame = frame.assign(**{date_column: synthetic.iso_format(pd.DatetimeIndex(frame[date_column]))})
+            self.frames[endpoint] = frame
+
+    def query(self, endpoint, params):
+        frame = self.frames[endpoint]
+        mask = pd.Series(True, index=frame.index)
+        for key, value in params:
+            for suffix, operator in COMPARISONS.items():
+                if key.endswith(suffix) and endpoint in self.times:
+                    bound = pd.Timestamp(value)
+                    bound = bound.tz_localize('UTC') if bound.tzinfo is None else bound
+                    mask &= getattr(self.times[endpoint], operator)(bound.value)
+                    break
+            else:
+                if key == 'session_key' and value == 'latest':
+                    continue
+                if key in frame.columns:
+                    mask &= frame[key].astype(str) == value
+        return frame[mask].to_json(orient='records').encode('utf-8')
+
+
+def make_handler(data):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+            if endpoint not in data.frames:
+                self.send_error(404)
+                return
+            body = data.query(endpoint, parse_qsl(url.query))
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=8001, drivers=20, duration=7200.0, seed=0, ready=None):
+    data = StubData(synthetic.generate(drivers, duration, seed))
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(data))
+    if ready is not None:
+        ready.set()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokalny zamiennik API OpenF1 z syntetycznymi danymi.")
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--drivers', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=7200.0, help="Długość sesji w sekundach.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(f"Serwer testowy: OPENF1_API_URL=http://127.0.0.1:{args.port}/v1")
+    serve(args.port, args.drivers, args.duration, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Generator syntetycznych danych OpenF1 (meetings, sessions, drivers, location, car_data, laps).
+
+Kierowcy jeżdżą po zamkniętej pętli z profilem prędkości zależnym od położenia na torze, z lekko różnym
+tempem na każdym okrążeniu. Częstotliwości próbkowania odpowiadają prawdziwemu API: ~3.7 Hz dla lokalizacji
+i ~4 Hz dla car_data.
+"""
+import numpy as np
+import pandas as pd
+
+MEETING_KEY = 9000
+SESSION_KEY = 9001
+SESSION_START = pd.Timestamp('2024-06-02T13:00:00', tz='UTC')
+LOCATION_RATE = 3.7
+CAR_DATA_RATE = 4.0
+TRACK_POINTS = 4000
+TEAM_COLOURS = ['3671C6', 'E8002D', '27F4D2', 'FF8000', '229971', '0093CC', '64C4FF', 'B6BABD', '52E252', '6692FF']
+DRIVER_NUMBERS = [1, 11, 16, 55, 44, 63, 4, 81, 14, 18, 10, 31, 23, 2, 22, 3, 27, 20, 24, 77]
+
+
+def _track():
+    """Punkty linii toru (w jednostkach OpenF1), długość łuku w metrach i docelowa prędkość w km/h."""
+    u = np.linspace(0, 2 * np.pi, TRACK_POINTS, endpoint=False)
+    radius = 1 + 0.25 * np.sin(3 * u) + 0.1 * np.cos(5 * u)
+    x = 8000 * radius * np.cos(u)
+    y = 5000 * radius * np.sin(u)
+    segment = np.hypot(np.diff(x, append=x[0]), np.diff(y, append=y[0])) / 10
+    distance = np.concatenate([[0], np.cumsum(segment)[:-1]])
+    length = segment.sum()
+    speed = 215 + 85 * np.cos(2 * np.pi * 4 * distance / length)
+    return x, y, distance, length, speed
+
+
+def _lap_schedule(rng, lap_time, start_offset, duration):
+    laps = int(duration / lap_time) + 3
+    durations = lap_time * (1 + rng.normal(0, 0.006, laps))
+    starts = start_offset + np.concatenate([[0], np.cumsum(durations)[:-1]])
+    return starts, durations
+
+
+def _positions(times, starts, durations, lap_clock, distance):
+    """Położenie na torze (indeks punktu i ułamek okrążenia) dla podanych chwil."""
+    lap = np.clip(np.searchsorted(starts, times, side='right') - 1, 0, len(starts) - 1)
+    fraction = np.clip((times - starts[lap]) / durations[lap], 0, 1)
+    track_distance = np.interp(fraction * lap_clock[-1], lap_clock, distance)
+    return np.searchsorted(distance, track_distance, side='right') - 1, lap
+
+
+def iso_format(dates):
+    return dates.strftime('%Y-%m-%dT%H:%M:%S.%f+00:00')
+
+
+def generate(drivers=20, duration=7200.0, seed=0):
+    """Zwraca słownik ramek danych dla każdego endpointu syntetycznej sesji."""
+    rng = np.random.default_rng(seed)
+    x, y, distance, length, speed = _track()
+    lap_clock = np.concatenate([[0], np.cumsum(np.diff(distance) / (speed[:-1] / 3.6))])
+    base_lap_time = lap_clock[-1]
+    session_end = SESSION_START + pd.Timedelta(seconds=duration)
+
+    driver_rows, location_frames, car_frames, lap_frames = [], [], [], []
+    for index, driver_number in enumerate(DRIVER_NUMBERS[:drivers]):
+        driver_rows.append({'driver_number': driver_number, 'name_acronym': f"S{driver_number:02d}",
+                            'full_name': f"Synthetic Driver {driver_number}",
+                            'team_name': f"Team {index // 2 + 1}", 'team_colour': TEAM_COLOURS[(index // 2) % 10],
+                            'session_key': SESSION_KEY, 'meeting_key': MEETING_KEY})
+        pace = 1 + 0.004 * index
+        starts, durations = _lap_schedule(rng, base_lap_time * pace, 0.3 * index, duration)
+
+        location_times = np.arange(0, duration, 1 / LOCATION_RATE) + rng.uniform(0, 0.05)
+        point, _ = _positions(location_times, starts, durations, lap_clock, distance)
+        location_frames.append(pd.DataFrame({
+            'date': SESSION_START + pd.to_timedelta(location_times, unit='s'), 'driver_number': driver_number,
+            'x': np.round(x[point]).astype(int), 'y': np.round(y[point]).astype(int), 'z': 0,
+            'session_key': SESSION_KEY, 'meeting_key': MEETING_KEY}))
+
+        car_times = np.arange(0, duration, 1 / CAR_DATA_RATE) + rng.uniform(0, 0.05)
+        point, lap = _positions(car_times, starts, durations, lap_clock, distance)
+        car_speed = speed[point] * base_lap_time / durations[lap] + rng.normal(0, 1.5, len(car_times))
+        slope = np.gradient(speed)[point]
+        gear = np.clip((car_speed // 40).astype(int) + 1, 1, 8)
+        car_frames.append(pd.DataFrame({
+            'date': SESSION_START + pd.to_timedelta(car_times, unit='s'), 'driver_number': driver_number,
+            'speed': np.round(car_speed).astype(int), 'rpm': np.round(7000 + car_speed * 20).astype(int),
+            'n_gear': gear, 'throttle': np.where(slope >= 0, 100, 10), 'brake': np.where(slope < -0.05, 100, 0),
+            'drs': np.where((slope > 0) & (car_speed > 280), 12, 0),
+            'session_key': SESSION_KEY, 'meeting_key': MEETING_KEY}))
+
+        sector_fractions = np.array([0.32, 0.36, 0.32]) + rng.normal(0, 0.002, (len(starts), 3))
+        sectors = durations[:, None] * sector_fractions / sector_fractions.sum(axis=1, keepdims=True)
+        in_session = starts < duration
+        lap_frames.append(pd.DataFrame({
+            'driver_number': driver_number, 'lap_number': np.arange(1, in_session.sum() + 1),
+            'date_start': SESSION_START + pd.to_timedelta(starts[in_session], unit='s'),
+            'lap_duration': np.round(durations[in_session], 3),
+            'duration_sector_1': np.round(sectors[in_session, 0], 3),
+            'duration_sector_2': np.round(sectors[in_session, 1], 3),
+            'duration_sector_3': np.round(sectors[in_session, 2], 3),
+            'is_pit_out_lap': np.arange(in_session.sum()) == 0,
+            'session_key': SESSION_KEY, 'meeting_key': MEETING_KEY}))
+
+    meeting = {'meeting_key': MEETING_KEY, 'meeting_name': "Synthetic Grand Prix", 'year': SESSION_START.year,
+               'circuit_short_name': "Synthetic", 'date_start': iso_format(pd.DatetimeIndex([SESSION_START]))[0]}
+    session = {'session_key': SESSION_KEY, 'meeting_key': MEETING_KEY, 'session_name': "Race",
+               'session_type': "Race", 'year': SESSION_START.year, 'circuit_short_name': "Synthetic",
+               'date_start': iso_format(pd.DatetimeIndex([SESSION_START]))[0],
+               'date_end': iso_format(pd.DatetimeIndex([session_end]))[0]}
+    return {
+        'meetings': pd.DataFrame([meeting]),
+        'sessions': pd.DataFrame([session]),
+        'drivers': pd.DataFrame(driver_rows),
+        'location': pd.concat(location_frames, ignore_index=True),
+        'car_data': pd.concat(car_frames, ignore_index=True),
+        'laps': pd.concat(lap_frames, ignore_index=True),
+    }
@@ -0,0 +1,85 @@
+import base64
+import io
+
+import numpy as np
+import plotly.io as pio
+
+from track_renderer import BRAKE_THRESHOLD, GEAR_COLORS
+
+PLAYBACK_WINDOW = 1200
+MIN_FRAME_DURATION_MS = 33
+
+
+def _encode_image(image):
+    buf = io.BytesIO()
+    image.convert('RGB').save(buf, format='JPEG', quality=80)
+    return "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode('ascii')
+
+
+def _marker_styles(frames, frame_indices, columns):
+    gears = np.nan_to_num(frames.field('n_gear')[frame_indices][:, columns]).astype(int).clip(0, len(GEAR_COLORS) - 1)
+    braking = frames.field('brake')[frame_indices][:, columns] > BRAKE_THRESHOLD
+    colors = np.array(GEAR_COLORS)[gears]
+    outline = np.where(braking, 'rgba(255, 20, 20, 0.8)', 'black')
+    widths = np.where(braking, 6, 2)
+    return [dict(size=14, color=colors[i].tolist(), line=dict(color=outline[i].tolist(), width=widths[i].tolist()))
+            for i in range(len(frame_indices))]
+
+
+def _positions(values):
+    return [None if np.isnan(v) else round(float(v), 1) for v in values]
+
+
+def build_playback_figure(frames, start, driver_numbers, drivers, renderer, map_mode, frame_duration_ms,
+                          window=PLAYBACK_WINDOW):
+    """Animacja Plotly dla okna `window` klatek od `start`, odtwarzana w całości po stronie przeglądarki.
+
+    Zwraca słownik figury (bez walidacji obiektów Plotly, która przy tysiącach klatek trwa sekundy).
+    Klatki zawierają tylko współrzędne (i kolory w trybie biegów), więc serwer wysyła okno jednorazowo.
+    """
+    stop = min(start + window, len(frames))
+    frame_indices = np.arange(start, stop)
+    columns = np.flatnonzero(np.isin(frames.driver_numbers, driver_numbers))
+    xs = frames.field('x')[frame_indices][:, columns]
+    ys = frames.field('y')[frame_indices][:, columns]
+    labels = [drivers.get(int(num), {}).get('name_acronym', str(num)) for num in frames.driver_numbers[columns]]
+    if map_mode == "Biegi i Hamowanie":
+        markers = _marker_styles(frames, frame_indices, columns)
+    else:
+        team_colors = [drivers.get(int(num), {}).get('team_colour', '#FFFFFF') for num in frames.driver_numbers[columns]]
+        markers = [None] * len(frame_indices)
+        markers[0] = dict(size=14, color=team_colors, line=dict(color='black', width=2))
+
+    animation_frames = []
+    for i in range(len(frame_indices)):
+        trace = dict(type='scatter', x=_positions(xs[i]), y=_positions(ys[i]))
+        if markers[i] is not None:
+            trace['marker'] = markers[i]
+        animation_frames.append(dict(name=str(i), data=[trace]))
+
+    min_x, max_x, min_y, max_y = (float(v) for v in renderer.track_extents.values())
+    frame_args = dict(frame=dict(duration=max(MIN_FRAME_DURATION_MS, frame_duration_ms), redraw=False),
+                      transition=dict(duration=0), mode='immediate', fromcurrent=True)
+    seek_args = dict(frame=dict(duration=0, redraw=False), transition=dict(duration=0), mode='immediate')
+    layout = dict(
+        images=[dict(source=_encode_image(renderer.base_image), xref='x', yref='y', x=min_x, y=max_y,
+                     sizex=max_x - min_x, sizey=max_y - min_y, sizing='stretch', layer='below')],
+        xaxis=dict(range=[min_x, max_x], visible=False, fixedrange=True),
+        yaxis=dict(range=[min_y, max_y], visible=False, fixedrange=True, scaleanchor='x'),
+        height=650, margin=dict(l=0, r=0, t=0, b=0), showlegend=False, paper_bgcolor='#0E1117',
+        plot_bgcolor='#0E1117', font=dict(color='white'),
+        updatemenus=[dict(type='buttons', direction='left', x=0, y=0, xanchor='left', yanchor='top',
+                          buttons=[dict(label='► Play', method='animate', args=[None, frame_args]),
+                                   dict(label='❚❚ Pause', method='animate', args=[[None], seek_args])])],
+        sliders=[dict(active=0, x=0.15, len=0.85, y=0, currentvalue=dict(prefix='Czas: '),
+                      steps=[dict(label=frames.timestamp(index).strftime('%H:%M:%S'), method='animate',
+                                  args=[[str(i)], seek_args]) for i, index in enumerate(frame_indices)])])
+    first = dict(animation_frames[0]['data'][0], mode='markers+text', text=labels, textposition='top center',
+                 textfont=dict(color='white', size=11), hoverinfo='text', marker=markers[0])
+    return dict(data=[first], layout=layout, frames=animation_frames)
+
+
+def playback_html(figure):
+    """Samodzielny fragment HTML z animacją; pomija walidację Plotly po stronie Pythona."""
+    return pio.to_html(figure, validate=False, include_plotlyjs='cdn', full_html=False, auto_play=False,
+                       config=dict(displayModeBar=False))
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+import api_client
+
+DEFAULT_FRAME_RATE = 5
+FRAME_FIELDS = ['x', 'y', 'speed', 'rpm', 'n_gear', 'throttle', 'brake', 'drs']
+INTEGER_FIELDS = {field: dtype for field, dtype in api_client.TELEMETRY_SCHEMA.items()
+                  if dtype.startswith(('int', 'uint')) and field in FRAME_FIELDS}
+
+
+class FrameArray:
+    """Gęsta tablica klatek animacji o kształcie (klatki, kierowcy, pola) na wspólnym zegarze.
+
+    Wartość NaN w polu `x` oznacza, że kierowca nie ma jeszcze żadnej próbki w danej chwili.
+    """
+
+    def __init__(self, clock, tz, driver_numbers, fields, values):
+        self.clock = clock
+        self.tz = tz
+        self.driver_numbers = driver_numbers
+        self.fields = fields
+        self.values = values
+        self._field_index = {field: i for i, field in enumerate(fields)}
+
+    def __len__(self):
+        return len(self.clock)
+
+    def timestamp(self, frame_index):
+        return pd.Timestamp(self.clock[frame_index], tz='UTC').tz_convert(self.tz) if self.tz else pd.Timestamp(
+            self.clock[frame_index])
+
+    def frame_index(self, timestamp):
+        """Indeks ostatniej klatki nie późniejszej niż `timestamp`."""
+        position = np.searchsorted(self.clock, pd.Timestamp(timestamp).value, side='right') - 1
+        return int(min(max(position, 0), len(self.clock) - 1))
+
+    def field(self, name):
+        return self.values[:, :, self._field_index[name]]
+
+    def to_frame(self):
+        """Płaska ramka do zapisu w magazynie: kolumna `date` i po jednej kolumnie `<pole>_<kierowca>`."""
+        dates = pd.to_datetime(self.clock, utc=True)
+        columns = [f"{field}_{driver_number}" for driver_number in self.driver_numbers for field in self.fields]
+        frame = pd.DataFrame(self.values.reshape(len(self.clock), -1), columns=columns)
+        frame.insert(0, 'date', dates.tz_convert(self.tz) if self.tz else dates.tz_localize(None))
+        return frame
+
+    @classmethod
+    def from_frame(cls, frame):
+        dates = frame['date']
+        tz = dates.dt.tz
+        columns = [column for column in frame.columns if column != 'date']
+        fields = list(dict.fromkeys(column.rsplit('_', 1)[0] for column in columns))
+        driver_numbers = np.array(list(dict.fromkeys(int(column.rsplit('_', 1)[1]) for column in columns)),
+                                  dtype='int64')
+        values = frame[columns].to_numpy(dtype='float32').reshape(len(frame), len(driver_numbers), len(fields))
+        return cls(dates.dt.as_unit('ns').astype('int64').to_numpy(), str(tz) if tz is not None else None,
+                   driver_numbers, fields, values)
+
+    def frame(self, frame_index, driver_numbers=None):
+        """Stan wszystkich (lub wybranych) kierowców w danej klatce jako mała ramka danych.
+
+        Wywoływane co klatkę, więc zamiast pełnego schematu telemetrii rzutujemy tylko kolumny całkowite.
+        """
+        frame_values = self.values[frame_index]
+        rows = np.isfinite(frame_values[:, self._field_index['x']])
+        if driver_numbers is not None:
+            rows &= np.isin(self.driver_numbers, driver_numbers)
+        selected = frame_values[rows]
+        columns = {'date': np.full(len(selected), self.clock[frame_index]).astype('datetime64[ns]'),
+                   'driver_number': self.driver_numbers[rows]}
+        for i, field in enumerate(self.fields):
+            dtype = INTEGER_FIELDS.get(field)
+            columns[field] = np.nan_to_num(selected[:, i]).astype(dtype) if dtype else selected[:, i]
+        frame = pd.DataFrame(columns)
+        if self.tz:
+            frame['date'] = frame['date'].dt.tz_localize('UTC').dt.tz_convert(self.tz)
+        return frame
+
+
+def build_frame_array(full_data, frame_rate=DEFAULT_FRAME_RATE):
+    """Przepróbkowuje telemetrię każdego kierowcy na wspólny zegar o stałej częstotliwości `frame_rate` (Hz).
+
+    W każdej klatce używana jest ostatnia znana próbka kierowcy (forward-fill).
+    """
+    fields = [field for field in FRAME_FIELDS if field in full_data.columns]
+    dates = full_data['date']
+    tz = dates.dt.tz
+    times = dates.dt.as_unit('ns').astype('int64').to_numpy()
+    step = int(1e9 / frame_rate)
+    clock = np.arange(times.min(), times.max() + 1, step, dtype='int64')
+
+    driver_numbers = np.sort(full_data['driver_number'].astype('int64').unique())
+    values = np.full((len(clock), len(driver_numbers), len(fields)), np.nan, dtype='float32')
+    driver_codes = np.searchsorted(driver_numbers, full_data['driver_number'].astype('int64').to_numpy())
+    order = np.lexsort((times, driver_codes))
+    sorted_codes, sorted_times = driver_codes[order], times[order]
+    sorted_values = full_data[fields].to_numpy(dtype='float32', na_value=np.nan)[order]
+    bounds = np.searchsorted(sorted_codes, np.arange(len(driver_numbers) + 1))
+
+    for driver_index in range(len(driver_numbers)):
+        start, end = bounds[driver_index], bounds[driver_index + 1]
+        driver_times, driver_values = sorted_times[start:end], sorted_values[start:end]
+        if not len(driver_times):
+            continue
+        sample = np.searchsorted(driver_times, clock, side='right') - 1
+        valid = sample >= 0
+        values[valid, driver_index] = driver_values[sample[valid]]
+
+    return FrameArray(clock, str(tz) if tz is not None else None, driver_numbers, fields, values)
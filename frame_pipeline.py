@@ -0,0 +1,90 @@
+import io
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+
+CACHE_CAPACITY = 512
+LOOKAHEAD = 30
+MAX_PENDING = 64
+WORKERS = 2
+
+
+def encode_frame(image, quality=90):
+    buf = io.BytesIO()
+    image.save(buf, format='JPEG', quality=quality)
+    return buf.getvalue()
+
+
+class FramePipeline:
+    """Ograniczony cache LRU zakodowanych klatek mapy z renderowaniem z wyprzedzeniem w tle.
+
+    Kluczem jest krotka (sesja, częstotliwość, indeks klatki, tryb mapy, filtr kierowców). Wpis to para
+    (zakodowana klatka, czas jej przygotowania w ms) - renderer jest współdzielony z wątkami w tle,
+    więc czas konkretnej klatki pamiętamy razem z nią.
+    """
+
+    def __init__(self, capacity=CACHE_CAPACITY, workers=WORKERS, max_pending=MAX_PENDING):
+        self.capacity = capacity
+        self.max_pending = max_pending
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame-prefetch")
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+            self._pending.pop(key, None)
+
+    def _render(self, key, render):
+        started = time.perf_counter()
+        try:
+            data = render()
+        except Exception:
+            with self._lock:
+                self._pending.pop(key, None)
+            raise
+        entry = (data, (time.perf_counter() - started) * 1000)
+        self._store(key, entry)
+        return entry
+
+    def get(self, key, render):
+        """Zwraca wpis (klatka, czas w ms) z cache, czeka na trwające renderowanie albo renderuje klatkę od razu."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                instrumentation.count("frame_cache.call")
+                return entry
+            future = self._pending.get(key)
+            self.misses += 1
+        instrumentation.count("frame_cache.call")
+        instrumentation.count("frame_cache.miss")
+        if future is not None:
+            return future.result()
+        return self._render(key, render)
+
+    def prefetch(self, jobs):
+        """Zleca w tle renderowanie klatek `(klucz, funkcja)`, których nie ma jeszcze w cache ani w kolejce."""
+        with self._lock:
+            for key, render in jobs:
+                if len(self._pending) >= self.max_pending:
+                    break
+                if key in self._cache or key in self._pending:
+                    continue
+                self._pending[key] = self._executor.submit(self._render, key, render)
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hit_rate': self.hits / lookups if lookups else 0.0, 'hits': self.hits, 'misses': self.misses,
+                    'queue_depth': len(self._pending), 'cached_frames': len(self._cache)}
@@ -0,0 +1,113 @@
+import functools
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+MAX_EVENTS = 5000
+LOG_PATH = os.environ.get("F1_INSTRUMENTATION_LOG")
+
+_events = deque(maxlen=MAX_EVENTS)
+_counters = Counter()
+_lock = threading.Lock()
+_log_queue = queue.SimpleQueue() if LOG_PATH else None
+
+
+def _write_log():
+    """Wątek zapisujący zdarzenia do LOG_PATH przez jeden otwarty plik, aby zapis nie blokował mierzonych wątków."""
+    with open(LOG_PATH, 'a', encoding='utf-8') as f:
+        while True:
+            f.write(json.dumps(_log_queue.get(), default=str) + "\n")
+            if _log_queue.empty():
+                f.flush()
+
+
+if _log_queue is not None:
+    threading.Thread(target=_write_log, name="instrumentation-log", daemon=True).start()
+
+
+def record(stage, ms, **attrs):
+    event = {'stage': stage, 'ms': ms, 'ts': time.time(), 'thread': threading.current_thread().name, **attrs}
+    with _lock:
+        _events.append(event)
+    if _log_queue is not None:
+        _log_queue.put(event)
+    return event
+
+
+@contextmanager
+def span(stage, **attrs):
+    """Mierzy czas bloku jako zdarzenie `stage`; do zwróconego słownika można dopisać atrybuty (np. bajty)."""
+    attrs = dict(attrs)
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        record(stage, (time.perf_counter() - started) * 1000, **attrs)
+
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] += n
+
+
+@contextmanager
+def cache_miss(name, **attrs):
+    """Span `name` liczony jako chybienie cache - używany w ciele funkcji opakowanej przez cache."""
+    count(f"{name}.miss")
+    with span(name, **attrs) as attrs:
+        yield attrs
+
+
+def counted(name):
+    """Dekorator zliczający wywołania funkcji z cache; razem z `cache_miss` daje trafienia i chybienia."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            count(f"{name}.call")
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def events(stage=None):
+    with _lock:
+        return [event for event in _events if stage is None or event['stage'] == stage]
+
+
+def summary():
+    """Statystyki czasu dla każdego etapu: liczba zdarzeń, suma, średnia, p95 i maksimum w ms."""
+    frame = pd.DataFrame(events())
+    if frame.empty:
+        return pd.DataFrame(columns=['stage', 'count', 'total_ms', 'mean_ms', 'p95_ms', 'max_ms'])
+    grouped = frame.groupby('stage')['ms']
+    result = pd.DataFrame({'count': grouped.size(), 'total_ms': grouped.sum(), 'mean_ms': grouped.mean(),
+                           'p95_ms': grouped.quantile(0.95), 'max_ms': grouped.max()})
+    if 'bytes' in frame:
+        result['bytes'] = frame.groupby('stage')['bytes'].sum()
+    return result.sort_values('total_ms', ascending=False).reset_index()
+
+
+def cache_stats():
+    """Wywołania, chybienia i skuteczność każdego cache zliczanego licznikami `<nazwa>.call` i `<nazwa>.miss`."""
+    current = counters()
+    rows = []
+    for name in sorted({key.rsplit('.', 1)[0] for key in current if key.endswith('.call')}):
+        calls, misses = current[f"{name}.call"], current.get(f"{name}.miss", 0)
+        rows.append({'cache': name, 'calls': calls, 'misses': misses,
+                     'hit_rate': (calls - misses) / calls if calls else 0.0})
+    return pd.DataFrame(rows, columns=['cache', 'calls', 'misses', 'hit_rate'])
+
+
+def to_jsonl():
+    return "".join(json.dumps(event, default=str) + "\n" for event in events())
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+# Kolejność, w jakiej telemetria sesji trafia do magazynu - dzięki niej indeks nie musi jej kopiować.
+TELEMETRY_ORDER = ['driver_number', 'date']
+DEFAULT_LAP_DURATION = 300
+SECTORS = (1, 2, 3)
+SECTOR_TABLE_COLUMNS = ['Okr.', 'S1', 'S2', 'S3']
+
+
+def _to_ns(dates):
+    return dates.dt.as_unit('ns').astype('int64').to_numpy()
+
+
+def _partition(driver_numbers):
+    """Zakresy wierszy [początek, koniec) każdego kierowcy w tablicy posortowanej po numerze kierowcy."""
+    numbers, starts = np.unique(driver_numbers, return_index=True)
+    ends = np.append(starts[1:], len(driver_numbers))
+    return {int(num): (int(start), int(end)) for num, start, end in zip(numbers, starts, ends)}
+
+
+def _is_ordered(driver_numbers, times):
+    same_driver = driver_numbers[1:] == driver_numbers[:-1]
+    return not (np.diff(driver_numbers) < 0).any() and not (np.diff(times)[same_driver] < 0).any()
+
+
+def _format_sector(times, previous, best_before):
+    emoji = np.select([times <= best_before, times < previous, previous.notna()], ["🟣", "🟢", "🟡"], "")
+    cells = []
+    for value, previous_value, mark in zip(times.to_numpy(), previous.to_numpy(), emoji):
+        if np.isnan(value):
+            cells.append("---")
+            continue
+        delta = f" ({value - previous_value:+.3f})" if not np.isnan(previous_value) else ""
+        cells.append(f"{value:.3f}s {mark}{delta}")
+    return pd.Series(cells, index=times.index, dtype=object)
+
+
+def build_sector_table(laps):
+    """Czasy sektorów każdego okrążenia z różnicą do poprzedniego okrążenia i do rekordu życiowego kierowcy.
+
+    `laps` musi być posortowane po (kierowca, czas startu). Wiersze wyniku odpowiadają wierszom `laps`,
+    a kolumny S1-S3 zawierają gotowe do wyświetlenia komórki (🟣 rekord, 🟢 szybciej, 🟡 wolniej).
+    """
+    table = pd.DataFrame({'driver_number': laps['driver_number'], 'Okr.': laps['lap_number']}, index=laps.index)
+    grouped = laps.groupby('driver_number', sort=False)
+    # Porównujemy tylko z okrążeniem o numerze o jeden mniejszym, tak jak panel robił to dotychczas.
+    follows_previous = grouped['lap_number'].shift(1) == laps['lap_number'] - 1
+    for sector in SECTORS:
+        column = f'duration_sector_{sector}'
+        times = pd.to_numeric(laps[column], errors='coerce') if column in laps else pd.Series(np.nan, index=laps.index)
+        previous = times.groupby(laps['driver_number'], sort=False).shift(1).where(follows_previous)
+        best = times.groupby(laps['driver_number'], sort=False).cummin()
+        best_before = best.groupby(laps['driver_number'], sort=False).ffill().groupby(
+            laps['driver_number'], sort=False).shift(1)
+        table[f'delta_prev_s{sector}'] = times - previous
+        table[f'delta_best_s{sector}'] = times - best_before
+        table[f'S{sector}'] = _format_sector(times, previous, best_before)
+    return table
+
+
+class LapIndex:
+    """Indeks okrążeń i telemetrii sesji podzielony na kierowców.
+
+    Okrążenia i próbki telemetrii są posortowane po (kierowca, czas), więc wyszukanie okrążenia w danej chwili
+    i wycięcie telemetrii okrążenia to `searchsorted` i wycinek, niezależnie od rozmiaru sesji. Telemetria
+    posortowana w TELEMETRY_ORDER (tak zapisuje ją magazyn) nie jest kopiowana - indeks trzyma tylko zakresy
+    wierszy kierowców i czasy próbek.
+    """
+
+    def __init__(self, laps, telemetry, sectors=None):
+        if laps.empty:
+            self.laps = pd.DataFrame(columns=['driver_number', 'lap_number', 'date_start', 'lap_duration'])
+        else:
+            self.laps = laps.sort_values(['driver_number', 'date_start'], kind='stable').reset_index(drop=True)
+        self._lap_ranges = _partition(self.laps['driver_number'].astype('int64').to_numpy())
+        self._lap_numbers = self.laps['lap_number'].astype('int64').to_numpy()
+        self._lap_starts = _to_ns(pd.to_datetime(self.laps['date_start'], utc=True))
+        durations = pd.to_numeric(self.laps['lap_duration'], errors='coerce').fillna(DEFAULT_LAP_DURATION)
+        self._lap_ends = self._lap_starts + (durations.to_numpy() * 1e9).astype('int64')
+        # Tabelę sektorów można podać gotową (np. z magazynu) - musi odpowiadać `self.laps` wiersz w wiersz.
+        if sectors is None or len(sectors) != len(self.laps):
+            sectors = build_sector_table(self.laps)
+        self.sectors = sectors
+
+        driver_numbers = telemetry['driver_number'].astype('int64').to_numpy()
+        times = _to_ns(telemetry['date'])
+        if not _is_ordered(driver_numbers, times):
+            order = np.lexsort((times, driver_numbers))
+            telemetry = telemetry.iloc[order].reset_index(drop=True)
+            driver_numbers, times = driver_numbers[order], times[order]
+        self.telemetry = telemetry
+        self._telemetry_ranges = _partition(driver_numbers)
+        self._telemetry_times = times
+
+    def driver_laps(self, driver_number):
+        start, end = self._lap_ranges.get(int(driver_number), (0, 0))
+        return self.laps.iloc[start:end]
+
+    def current_lap_position(self, driver_number, timestamp):
+        """Pozycja (w `self.laps`) ostatniego okrążenia kierowcy rozpoczętego nie później niż `timestamp`."""
+        start, end = self._lap_ranges.get(int(driver_number), (0, 0))
+        position = start + np.searchsorted(self._lap_starts[start:end], pd.Timestamp(timestamp).value,
+                                           side='right') - 1
+        return int(position) if position >= start else None
+
+    def current_sectors(self, driver_numbers, timestamp):
+        """Wiersze tabeli sektorów z bieżącym okrążeniem każdego z podanych kierowców."""
+        positions = [self.current_lap_position(num, timestamp) for num in driver_numbers]
+        return self.sectors.iloc[[position for position in positions if position is not None]]
+
+    def lap_position(self, driver_number, lap_number):
+        start, end = self._lap_ranges.get(int(driver_number), (0, 0))
+        lap_numbers = self._lap_numbers[start:end]
+        position = np.searchsorted(lap_numbers, lap_number)
+        if position < len(lap_numbers) and lap_numbers[position] == lap_number:
+            return int(start + position)
+        return None
+
+    def fastest_lap_position(self, driver_number):
+        durations = pd.to_numeric(self.driver_laps(driver_number)['lap_duration'], errors='coerce')
+        return int(durations.idxmin()) if durations.notna().any() else None
+
+    def lap_telemetry(self, driver_number, lap_position):
+        """Próbki telemetrii kierowcy między początkiem a końcem okrążenia (włącznie)."""
+        start, end = self._telemetry_ranges.get(int(driver_number), (0, 0))
+        times = self._telemetry_times[start:end]
+        first = np.searchsorted(times, self._lap_starts[lap_position], side='left')
+        last = np.searchsorted(times, self._lap_ends[lap_position], side='right')
+        return self.telemetry.iloc[start + first:start + last]
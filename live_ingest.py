@@ -0,0 +1,198 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import api_client
+
+RING_CAPACITY = 4096
+POLL_INTERVAL = 2.0
+LIVE_BACKFILL = pd.Timedelta('30s')
+# Rekordy potrafią docierać do API z opóźnieniem, więc każde zapytanie zachodzi na poprzednie o ten margines.
+LATE_MARGIN = pd.Timedelta('5s')
+MERGE_TOLERANCE = pd.Timedelta('2s')
+# Bez odczytów przez tyle sekund (nikt nie ogląda) poller kończy pracę i przestaje odpytywać API.
+IDLE_TIMEOUT = 60.0
+LIVE_FIELDS = ['x', 'y', 'speed', 'rpm', 'n_gear', 'throttle', 'brake', 'drs']
+
+_running = set()
+_running_lock = threading.Lock()
+
+
+class DriverRingBuffer:
+    """Bufor cykliczny o stałej pojemności z ostatnimi próbkami jednego kierowcy."""
+
+    def __init__(self, capacity=RING_CAPACITY, fields=LIVE_FIELDS):
+        self.capacity = capacity
+        self.fields = fields
+        self.times = np.zeros(capacity, dtype='int64')
+        self.values = np.full((capacity, len(fields)), np.nan, dtype='float32')
+        self.size = 0
+        self._head = 0
+        self._lock = threading.Lock()
+
+    def append(self, times, values):
+        times, values = times[-self.capacity:], values[-self.capacity:]
+        with self._lock:
+            positions = (self._head + np.arange(len(times))) % self.capacity
+            self.times[positions] = times
+            self.values[positions] = values
+            self._head = (self._head + len(times)) % self.capacity
+            self.size = min(self.size + len(times), self.capacity)
+
+    def latest(self):
+        """Czas i kopia ostatniej próbki albo (None, None) przy pustym buforze."""
+        with self._lock:
+            if not self.size:
+                return None, None
+            position = (self._head - 1) % self.capacity
+            return self.times[position], self.values[position].copy()
+
+    def segments(self):
+        """Kopie próbek w kolejności chronologicznej (jeden lub dwa wycinki tablic bufora).
+
+        Kopiujemy pod blokadą, bo wątek odpytujący nadpisuje najstarsze próbki.
+        """
+        with self._lock:
+            start = (self._head - self.size) % self.capacity
+            if start + self.size <= self.capacity:
+                return [(self.times[start:start + self.size].copy(), self.values[start:start + self.size].copy())]
+            return [(self.times[start:].copy(), self.values[start:].copy()),
+                    (self.times[:self._head].copy(), self.values[:self._head].copy())]
+
+
+class LivePoller:
+    """Odpytuje API w tle i dokłada do buforów kierowców tylko nowe, połączone z car_data próbki."""
+
+    def __init__(self, session_key='latest', start_date=None, poll_interval=POLL_INTERVAL, capacity=RING_CAPACITY,
+                 idle_timeout=IDLE_TIMEOUT):
+        self.session_key = session_key
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.capacity = capacity
+        start_date = start_date if start_date is not None else pd.Timestamp.now(tz='UTC') - LIVE_BACKFILL
+        self.watermarks = {'location': start_date, 'car_data': start_date}
+        self.buffers = {}
+        self.sample_count = 0
+        self.last_poll_seconds = 0.0
+        self.last_sample_time = None
+        self._last_seen = {'location': {}, 'car_data': {}}
+        self._car_tail = None
+        self._buffers_lock = threading.Lock()
+        self._last_read = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="live-poller", daemon=True)
+
+    def start(self):
+        """Uruchamia odpytywanie i zatrzymuje pollery innych sesji - na żywo śledzimy tylko jedną sesję."""
+        with _running_lock:
+            others = [poller for poller in _running if poller.session_key != self.session_key]
+            _running.add(self)
+        for other in others:
+            other.stop()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with _running_lock:
+            _running.discard(self)
+
+    @property
+    def is_running(self):
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            if started - self._last_read > self.idle_timeout:
+                self.stop()
+                break
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"!!! Błąd odpytywania na żywo: {e}")
+            self._stop.wait(max(0.0, self.poll_interval - (time.monotonic() - started)))
+
+    def _new_rows(self, endpoint):
+        frame = api_client.get_live_frame(endpoint, self.watermarks[endpoint] - LATE_MARGIN, self.session_key)
+        if frame.empty:
+            return frame
+        frame['driver_number'] = frame['driver_number'].astype('int64')
+        times = frame['date'].dt.as_unit('ns').astype('int64').to_numpy()
+        last_seen = self._last_seen[endpoint]
+        seen_until = np.array([last_seen.get(num, -1) for num in frame['driver_number'].to_numpy()], dtype='int64')
+        frame = frame[times > seen_until]
+        if frame.empty:
+            return frame
+        newest = frame.groupby('driver_number')['date'].max()
+        last_seen.update({int(num): pd.Timestamp(date).value for num, date in newest.items()})
+        self.watermarks[endpoint] = max(self.watermarks[endpoint], frame['date'].max())
+        return frame.sort_values('date')
+
+    def poll_once(self):
+        started = time.monotonic()
+        locations = self._new_rows('location')
+        car_data = self._new_rows('car_data')
+        tail = self._car_tail
+        if not car_data.empty:
+            tail = car_data if tail is None else pd.concat([tail, car_data], ignore_index=True).sort_values('date')
+        if not locations.empty:
+            if tail is not None:
+                merged = pd.merge_asof(locations, tail, on='date', by='driver_number', direction='nearest',
+                                       tolerance=MERGE_TOLERANCE)
+            else:
+                merged = locations.reindex(columns=api_client.LOCATION_COLUMNS + api_client.CAR_DATA_COLUMNS[2:])
+            self._append(api_client.apply_telemetry_schema(merged))
+        # Zachowujemy tylko końcówkę car_data, która może jeszcze pasować do spóźnionych próbek lokalizacji.
+        if tail is not None:
+            self._car_tail = tail[tail['date'] >= tail['date'].max() - MERGE_TOLERANCE - LATE_MARGIN]
+        self.last_poll_seconds = time.monotonic() - started
+
+    def _append(self, merged):
+        fields = [field for field in LIVE_FIELDS if field in merged.columns]
+        times = merged['date'].dt.as_unit('ns').astype('int64').to_numpy()
+        values = merged[fields].to_numpy(dtype='float32', na_value=np.nan)
+        driver_numbers = merged['driver_number'].astype('int64').to_numpy()
+        for driver_number in np.unique(driver_numbers):
+            rows = driver_numbers == driver_number
+            with self._buffers_lock:
+                buffer = self.buffers.get(int(driver_number))
+                if buffer is None:
+                    buffer = self.buffers[int(driver_number)] = DriverRingBuffer(self.capacity, fields)
+            buffer.append(times[rows], values[rows])
+        # Aplikacja sprawdza sample_count, a potem czyta last_sample_time, więc czas ustawiamy najpierw.
+        self.last_sample_time = pd.Timestamp(int(times.max()), tz='UTC')
+        self.sample_count += len(merged)
+
+    def _buffer_items(self):
+        # Wątek odpytujący dokłada bufory nowych kierowców, więc iterujemy po migawce słownika.
+        with self._buffers_lock:
+            return list(self.buffers.items())
+
+    def latest_frame(self, driver_numbers=None):
+        """Ostatnia znana próbka każdego kierowcy w formacie klatki animacji."""
+        self._last_read = time.monotonic()
+        rows = []
+        for driver_number, buffer in self._buffer_items():
+            if driver_numbers is not None and driver_number not in driver_numbers:
+                continue
+            sample_time, values = buffer.latest()
+            if sample_time is not None:
+                rows.append(dict(zip(buffer.fields, values), date=pd.Timestamp(int(sample_time), tz='UTC'),
+                                 driver_number=driver_number))
+        if not rows:
+            return pd.DataFrame(columns=['date', 'driver_number'] + LIVE_FIELDS)
+        return api_client.apply_telemetry_schema(pd.DataFrame(rows))
+
+    def history(self):
+        """Próbki zgromadzone w buforach jako jedna ramka (kopia) - np. do narysowania toru."""
+        frames = []
+        for driver_number, buffer in self._buffer_items():
+            for times, values in buffer.segments():
+                frame = pd.DataFrame(values, columns=buffer.fields)
+                frame.insert(0, 'driver_number', driver_number)
+                frame.insert(0, 'date', pd.to_datetime(times, utc=True))
+                frames.append(frame)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
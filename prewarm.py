@@ -0,0 +1,152 @@
+"""Wstępne przygotowanie magazynu dla sezonu, wybranych weekendów albo sesji - bez uruchamiania aplikacji.
+
+Przykład: python prewarm.py --year 2024 --session-types Race Qualifying --workers 3
+Dla każdej zakończonej sesji pobiera kierowców, telemetrię i okrążenia oraz liczy klatki animacji, tabelę
+sektorów i obrys toru. Ponowne uruchomienie pomija sesje, których artefakty są już w magazynie.
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import api_client
+import frame_engine
+import session_artifacts
+import session_store
+
+
+def _quiet(enabled):
+    return contextlib.redirect_stdout(io.StringIO()) if enabled else contextlib.nullcontext()
+
+
+def _init_worker(workers):
+    # Limit zapytań obowiązuje w obrębie procesu, więc dzielimy go między procesy robocze.
+    api_client.set_rate_limit(api_client.REQUESTS_PER_SECOND / workers)
+
+
+def artifact_names(frame_rates):
+    return ['drivers', 'telemetry'] + [f"frames_{frame_rate}hz" for frame_rate in frame_rates]
+
+
+def is_warm(session, frame_rates):
+    """Sesja jest gotowa, gdy ma znacznik ukończenia dla tych częstotliwości i jej artefakty są nadal w magazynie.
+
+    Znacznik obejmuje też sesje bez okrążeń czy bez telemetrii, których artefakty nigdy nie powstaną.
+    """
+    session_key = session['session_key']
+    marker = session_store.load_frame(session_key, "prewarm")
+    if marker is None or not set(frame_rates) <= set(marker['frame_rate'].tolist()):
+        return False
+    if not marker['has_telemetry'].iloc[0]:
+        return True
+    return all(session_store.has_frame(session_key, name) for name in artifact_names(frame_rates))
+
+
+def _mark_warm(session_key, frame_rates, has_telemetry):
+    marker = session_store.load_frame(session_key, "prewarm")
+    if marker is not None:
+        frame_rates = sorted(set(frame_rates) | set(marker['frame_rate'].tolist()))
+    session_store.save_frame(session_key, "prewarm", pd.DataFrame({'frame_rate': frame_rates,
+                                                                   'has_telemetry': has_telemetry}))
+
+
+def prewarm_session(session, frame_rates, quiet=True):
+    """Przygotowuje wszystkie artefakty jednej sesji; uruchamiane w procesie roboczym."""
+    started = time.perf_counter()
+    session_key = session['session_key']
+    start_date, end_date = pd.to_datetime(session['date_start']), pd.to_datetime(session['date_end'])
+    with _quiet(quiet):
+        session_artifacts.load_drivers(session_key, end_date)
+        telemetry, laps = session_artifacts.load_session_data(session_key, start_date, end_date)
+        if telemetry.empty:
+            _mark_warm(session_key, frame_rates, False)
+            return "brak telemetrii", time.perf_counter() - started
+        for frame_rate in frame_rates:
+            session_artifacts.load_frame_array(session_key, telemetry, frame_rate)
+        index = session_artifacts.load_lap_index(session_key, laps, telemetry)
+        outline, _ = session_artifacts.load_track_outline(session['circuit_short_name'], session_key, index)
+        _mark_warm(session_key, frame_rates, True)
+    status = f"{len(telemetry)} próbek, {len(laps)} okrążeń" + ("" if outline is not None else ", bez obrysu toru")
+    return status, time.perf_counter() - started
+
+
+def select_sessions(args):
+    if args.sessions:
+        sessions = [api_client.get_session_info(session_key) for session_key in args.sessions]
+        sessions = pd.DataFrame([session for session in sessions if session])
+    else:
+        meeting_keys = args.meetings
+        if not meeting_keys:
+            meetings = session_artifacts.load_meetings(args.year)
+            meeting_keys = meetings['meeting_key'].tolist() if not meetings.empty else []
+        frames = [session_artifacts.load_sessions(meeting_key) for meeting_key in meeting_keys]
+        frames = [frame for frame in frames if not frame.empty]
+        sessions = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if sessions.empty:
+        return []
+    if args.session_types:
+        sessions = sessions[sessions['session_name'].isin(args.session_types)
+                            | sessions['session_type'].isin(args.session_types)]
+    return sessions.sort_values('date_start').to_dict(orient='records')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wstępne przygotowanie magazynu danych sesji F1 dla aplikacji.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--year', type=int)
+    target.add_argument('--meetings', type=int, nargs='+', metavar='MEETING_KEY')
+    target.add_argument('--sessions', type=int, nargs='+', metavar='SESSION_KEY')
+    parser.add_argument('--session-types', nargs='+', metavar='TYPE',
+                        help="Nazwy lub typy sesji, np. Race Qualifying (domyślnie wszystkie).")
+    parser.add_argument('--frame-rates', type=int, nargs='+', default=[frame_engine.DEFAULT_FRAME_RATE],
+                        help="Częstotliwości klatek animacji (Hz) do przygotowania.")
+    parser.add_argument('--workers', type=int, default=2, help="Liczba procesów roboczych.")
+    parser.add_argument('--max-store-mb', type=int,
+                        help="Limit rozmiaru magazynu; cały sezon zwykle nie mieści się w domyślnym F1_STORE_MAX_MB.")
+    parser.add_argument('--verbose', action='store_true', help="Pokazuj logi zapytań do API.")
+    args = parser.parse_args()
+
+    if not session_store.is_enabled():
+        parser.error("Magazyn wymaga pakietu pyarrow.")
+    if session_store.OFFLINE:
+        parser.error("W trybie offline (F1_OFFLINE=1) nie można pobierać danych.")
+    if args.max_store_mb:
+        # Procesy robocze startują od nowa (spawn) i czytają limit ze zmiennej środowiskowej.
+        os.environ["F1_STORE_MAX_MB"] = str(args.max_store_mb)
+        session_store.MAX_STORE_BYTES = args.max_store_mb * 1024 * 1024
+
+    with _quiet(not args.verbose):
+        sessions = select_sessions(args)
+    finished = [session for session in sessions if session_store.is_finished(session['date_end'])]
+    pending = [session for session in finished if not is_warm(session, args.frame_rates)]
+    print(f"Sesji: {len(sessions)}, zakończonych: {len(finished)}, już gotowych: {len(finished) - len(pending)}, "
+          f"do przygotowania: {len(pending)}")
+
+    failed = 0
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=_init_worker,
+                             initargs=(args.workers,)) as executor:
+        futures = {executor.submit(prewarm_session, session, args.frame_rates, not args.verbose): session
+                   for session in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            session = futures[future]
+            label = f"{session['session_key']} {session.get('circuit_short_name')} - {session.get('session_name')}"
+            try:
+                status, seconds = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(pending)}] {label}: BŁĄD {e}")
+            else:
+                print(f"[{done}/{len(pending)}] {label}: {status} ({seconds:.1f} s)")
+    print(f"Zakończono: {len(pending) - failed} przygotowanych, {failed} błędów.")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
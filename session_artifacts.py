@@ -0,0 +1,97 @@
+"""Wczytywanie danych sesji i artefaktów pochodnych przez magazyn - wspólne dla aplikacji i prewarm.py.
+
+Artefakty pochodne (klatki animacji, tabela sektorów) trafiają do magazynu tylko wtedy, gdy jest w nim
+telemetria sesji, czyli gdy sesja jest zakończona.
+"""
+import pandas as pd
+
+import api_client
+import frame_engine
+import lap_index
+import session_store
+import track_renderer
+
+
+def load_meetings(year):
+    def fetch():
+        meetings = api_client.get_meetings(year)
+        return pd.DataFrame(meetings) if meetings else pd.DataFrame()
+
+    # Kalendarz bieżącego sezonu jeszcze się zmienia, ale też trafia do magazynu - inaczej w trybie offline
+    # nie dałoby się wybrać żadnej sesji tego sezonu.
+    return session_store.load_or_fetch(f"year_{year}", "meetings", fetch, refresh=year >= pd.Timestamp.now().year)
+
+
+def load_sessions(meeting_key):
+    def fetch():
+        sessions = api_client.get_sessions(meeting_key)
+        return pd.DataFrame(sessions) if sessions else pd.DataFrame()
+
+    # Listę sesji trwającego weekendu też zapisujemy (odświeżaną), aby jego zakończone sesje były dostępne offline.
+    stored = session_store.load_frame(f"meeting_{meeting_key}", "sessions")
+    if stored is not None and all(session_store.is_finished(d) for d in pd.to_datetime(stored['date_end'])):
+        return stored
+    return session_store.load_or_fetch(f"meeting_{meeting_key}", "sessions", fetch, refresh=True)
+
+
+def load_drivers(session_key, end_date):
+    frame = session_store.load_or_fetch(
+        session_key, "drivers", lambda: session_store.drivers_to_frame(api_client.get_drivers_for_session(session_key)),
+        persist=session_store.is_finished(end_date))
+    return session_store.frame_to_drivers(frame)
+
+
+def load_session_data(session_key, start_date, end_date):
+    """Telemetria (lokalizacja połączona z car_data, bez próbek bez pozycji, w kolejności kierowca, czas)
+    i okrążenia sesji."""
+    def fetch():
+        chunks = api_client.iter_session_chunks(session_key, start_date, end_date, api_client.STREAM_WINDOW)
+        return (chunk.dropna(subset=['x', 'y', 'date']) for chunk in chunks)
+
+    persist = session_store.is_finished(end_date)
+    telemetry = session_store.load_or_fetch(session_key, "telemetry", fetch, persist=persist,
+                                            sort_by=lap_index.TELEMETRY_ORDER)
+    if not telemetry.empty: telemetry = api_client.apply_telemetry_schema(telemetry)
+    laps = session_store.load_or_fetch(session_key, "laps", lambda: api_client.get_laps_for_session(session_key),
+                                       persist=persist)
+    return telemetry, laps
+
+
+def load_frame_array(session_key, telemetry, frame_rate):
+    if session_store.has_frame(session_key, "telemetry"):
+        frame = session_store.load_or_fetch(
+            session_key, f"frames_{frame_rate}hz",
+            lambda: frame_engine.build_frame_array(telemetry, frame_rate).to_frame())
+        if not frame.empty:
+            return frame_engine.FrameArray.from_frame(frame)
+    return frame_engine.build_frame_array(telemetry, frame_rate)
+
+
+def load_lap_index(session_key, laps, telemetry):
+    persist = session_store.has_frame(session_key, "telemetry")
+    sectors = session_store.load_frame(session_key, "sectors") if persist else None
+    index = lap_index.LapIndex(laps, telemetry, sectors)
+    if persist and sectors is None and not index.sectors.empty:
+        session_store.save_frame(session_key, "sectors", index.sectors)
+    return index
+
+
+def load_track_outline(circuit_name, session_key, index):
+    """Obrys toru i zakres współrzędnych; obrys jest wspólny dla sesji na torze, więc kluczem jest nazwa toru.
+
+    Zakres z magazynu pochodzi z sesji, z której zbudowano obrys, więc poszerzamy go o zakres bieżącej sesji,
+    aby żadna jej próbka nie wypadła poza obraz.
+    """
+    persist = session_store.has_frame(session_key, "telemetry")
+    frame = session_store.load_or_fetch(
+        f"circuit_{circuit_name}", "track_outline",
+        lambda: session_store.outline_to_frame(*track_renderer.build_track_outline(index)),
+        persist=lambda frame: persist and not frame.empty)
+    outline, track_extents = session_store.frame_to_outline(frame)
+    if outline is None or index.telemetry.empty:
+        return outline, track_extents
+    session_extents = track_renderer.telemetry_extents(index.telemetry)
+    return outline, {'min_x': min(track_extents['min_x'], session_extents['min_x']),
+                     'max_x': max(track_extents['max_x'], session_extents['max_x']),
+                     'min_y': min(track_extents['min_y'], session_extents['min_y']),
+                     'max_y': max(track_extents['max_y'], session_extents['max_y'])}
@@ -0,0 +1,40 @@
+import itertools
+import threading
+import weakref
+
+# Zmiana formatu danych sesji (np. schematu telemetrii) musi podbić tę wersję, aby unieważnić artefakty pochodne.
+SCHEMA_VERSION = 1
+
+# Słabe referencje: zestaw danych żyje tak długo, jak trzyma go wpis cache, który go zarejestrował
+# (np. load_session_dataset z ttl), więc rejestr sam niczego nie przetrzymuje w pamięci.
+_datasets = weakref.WeakValueDictionary()
+_lock = threading.Lock()
+_registrations = itertools.count(1)
+
+
+class SessionDataset:
+    """Niezmienny zestaw danych sesji (telemetria i okrążenia) identyfikowany lekkim kluczem.
+
+    Klucz zawiera numer rejestracji, więc ponowne pobranie sesji (np. trwającej, po wygaśnięciu cache)
+    unieważnia wszystkie artefakty pochodne zbudowane ze starszych danych.
+    Ramki traktujemy jako tylko do odczytu - są współdzielone przez wszystkich widzów w procesie.
+    """
+
+    def __init__(self, session_key, telemetry, laps, registration):
+        self.session_key = session_key
+        self.key = (session_key, SCHEMA_VERSION, registration)
+        self.telemetry = telemetry
+        self.laps = laps
+
+
+def register(session_key, telemetry, laps):
+    """Rejestruje i zwraca zestaw danych; wywołujący musi trzymać zwrócony obiekt, aby klucz pozostał ważny."""
+    with _lock:
+        dataset = SessionDataset(session_key, telemetry, laps, next(_registrations))
+        _datasets[dataset.key] = dataset
+    return dataset
+
+
+def get(key):
+    with _lock:
+        return _datasets.get(key)
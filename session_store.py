@@ -0,0 +1,229 @@
+import contextlib
+import os
+import time
+
+import pandas as pd
+
+import instrumentation
+import single_flight
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = feather = None
+
+STORE_DIR = os.environ.get("F1_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".f1_store"))
+MAX_STORE_BYTES = int(os.environ.get("F1_STORE_MAX_MB", "4096")) * 1024 * 1024
+OFFLINE = os.environ.get("F1_OFFLINE", "0") == "1"
+
+_load_flight = single_flight.SingleFlight('store')
+
+
+def is_enabled():
+    return feather is not None
+
+
+def _frame_path(key, name):
+    return os.path.join(STORE_DIR, str(key), f"{name}.arrow")
+
+
+def has_frame(key, name):
+    return is_enabled() and os.path.exists(_frame_path(key, name))
+
+
+def load_frame(key, name):
+    """Wczytuje ramkę z magazynu albo zwraca None.
+
+    Plik jest mapowany w pamięci, a kolumny liczbowe i dat (zapisane jednym blokiem) trafiają do ramki bez
+    kopiowania - są więc tylko do odczytu.
+    """
+    if not is_enabled():
+        return None
+    path = _frame_path(key, name)
+    if not os.path.exists(path):
+        return None
+    try:
+        frame = feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+        # Czas dostępu służy do usuwania najdawniej używanych plików.
+        os.utime(path)
+    except FileNotFoundError:
+        # Plik usunął w międzyczasie inny proces (np. przy usuwaniu najdawniej używanych plików).
+        return None
+    except (OSError, ValueError) as e:
+        print(f"!!! Uszkodzony plik magazynu '{path}': {e}")
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        return None
+    return frame
+
+
+def save_frame(key, name, frame):
+    if not is_enabled() or frame is None or frame.empty:
+        return
+    path = _frame_path(key, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # Jeden blok na kolumnę - tylko taki pandas odczyta bez kopiowania.
+    feather.write_feather(frame.reset_index(drop=True), tmp_path, compression='uncompressed', chunksize=len(frame))
+    os.replace(tmp_path, path)
+    evict()
+
+
+def save_chunks(key, name, chunks, sort_by=None):
+    """Dopisuje kolejne ramki z generatora do jednego pliku Arrow IPC, nie składając ich w pamięci.
+
+    Na koniec plik jest przepisywany w jeden blok na kolumnę (jedna kopia danych, czytana z mapowanego pliku),
+    aby późniejsze odczyty nie kopiowały danych; przy okazji wiersze są sortowane po kolumnach `sort_by`.
+    Zwraca liczbę zapisanych wierszy.
+    """
+    if not is_enabled():
+        return 0
+    path = _frame_path(key, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    writer, schema, rows = None, None, 0
+    try:
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            # Słowniki kategorii różnią się między fragmentami, a format pliku IPC wymaga jednego słownika.
+            categorical = chunk.select_dtypes('category').columns
+            if len(categorical):
+                chunk = chunk.astype({column: chunk[column].cat.categories.dtype for column in categorical})
+            table = pa.Table.from_pandas(chunk.reset_index(drop=True), preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pa.ipc.new_file(tmp_path, schema)
+            else:
+                table = table.cast(schema)
+            writer.write_table(table)
+            rows += table.num_rows
+    except BaseException:
+        if writer is not None:
+            writer.close()
+            os.remove(tmp_path)
+        raise
+    if writer is None:
+        return 0
+    writer.close()
+    compact_path = f"{path}.{os.getpid()}.compact.tmp"
+    table = feather.read_table(tmp_path, memory_map=True)
+    if sort_by:
+        table = table.sort_by([(column, 'ascending') for column in sort_by])
+    table = table.combine_chunks()
+    with pa.ipc.new_file(compact_path, table.schema) as compact_writer:
+        compact_writer.write_table(table)
+    del table
+    os.remove(tmp_path)
+    os.replace(compact_path, path)
+    evict()
+    return rows
+
+
+def evict(max_bytes=None):
+    """Usuwa najdawniej używane pliki, dopóki magazyn nie zmieści się w limicie rozmiaru.
+
+    Może działać równolegle w kilku procesach (prewarm.py), więc pliki znikające w trakcie są pomijane,
+    a puste katalogi zostają - inny proces mógł właśnie zacząć w nich zapis.
+    """
+    max_bytes = MAX_STORE_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(STORE_DIR):
+        return
+    entries = []
+    for root, _, files in os.walk(STORE_DIR):
+        for file_name in files:
+            if file_name.endswith(".arrow"):
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        print(f"--- Usuwanie z magazynu: {path} ---")
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        total -= size
+
+
+def is_finished(end_date):
+    """Sesja zakończona dawniej niż godzinę temu nie będzie się już zmieniać."""
+    if end_date is None or pd.isna(end_date):
+        return False
+    end_date = pd.Timestamp(end_date)
+    if end_date.tzinfo is None:
+        end_date = end_date.tz_localize('UTC')
+    return end_date + pd.Timedelta(hours=1) < pd.Timestamp(time.time(), unit='s', tz='UTC')
+
+
+def load_or_fetch(key, name, fetch, persist=True, refresh=False, sort_by=None):
+    """Zwraca ramkę z magazynu, a gdy jej brak - pobiera ją przez `fetch` i zapisuje.
+
+    `fetch` może zwrócić ramkę albo generator ramek; generator przy zapisie trafia prosto na dysk.
+    `persist` może być wartością logiczną albo funkcją decydującą na podstawie pobranej ramki.
+    `refresh` (dla danych, które jeszcze się zmieniają) pobiera ramkę mimo zapisanej kopii i ją nadpisuje;
+    zapisana kopia służy tylko w trybie offline albo gdy pobranie się nie powiedzie.
+    `sort_by` to kolumny, po których pobrana ramka jest sortowana raz - przed zapisem albo w pamięci.
+    Równoczesne wywołania dla tej samej ramki (np. z kilku sesji Streamlit) pobierają ją tylko raz.
+    """
+    return _load_flight.do((str(key), name), lambda: _load_or_fetch(key, name, fetch, persist, refresh, sort_by))
+
+
+def _load_or_fetch(key, name, fetch, persist, refresh, sort_by):
+    instrumentation.count("store.call")
+    frame = load_frame(key, name) if OFFLINE or not refresh else None
+    if frame is not None:
+        print(f"--- Magazyn: wczytano '{name}' dla {key} ({len(frame)} wierszy) ---")
+        return frame
+    instrumentation.count("store.miss")
+    if OFFLINE:
+        print(f"!!! Tryb offline: brak '{name}' dla {key} w magazynie.")
+        return pd.DataFrame()
+    frame = fetch()
+    if not isinstance(frame, pd.DataFrame):
+        if persist and not callable(persist) and is_enabled():
+            save_chunks(key, name, frame, sort_by)
+            frame = load_frame(key, name)
+            return frame if frame is not None else pd.DataFrame()
+        chunks = [chunk for chunk in frame if not chunk.empty] if frame is not None else []
+        frame = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+    if sort_by and not frame.empty:
+        frame = frame.sort_values(sort_by, kind='stable', ignore_index=True)
+    if frame.empty and refresh:
+        stored = load_frame(key, name)
+        return stored if stored is not None else frame
+    if callable(persist):
+        persist = persist(frame)
+    if persist:
+        save_frame(key, name, frame)
+    return frame
+
+
+def drivers_to_frame(drivers):
+    frame = pd.DataFrame.from_dict(drivers, orient='index')
+    frame.index.name = 'driver_number'
+    return frame.reset_index()
+
+
+def frame_to_drivers(frame):
+    if frame.empty:
+        return {}
+    return {int(num): details for num, details in frame.set_index('driver_number').to_dict(orient='index').items()}
+
+
+def outline_to_frame(outline, track_extents):
+    """Obrys toru jako ramka: punkty w kolumnach x, y i zakres współrzędnych powtórzony w każdym wierszu."""
+    if outline is None:
+        return pd.DataFrame()
+    return pd.DataFrame({'x': outline[:, 0], 'y': outline[:, 1], **track_extents})
+
+
+def frame_to_outline(frame):
+    if frame.empty:
+        return None, None
+    track_extents = {name: float(frame[name].iloc[0]) for name in ('min_x', 'max_x', 'min_y', 'max_y')}
+    return frame[['x', 'y']].to_numpy(dtype='float64'), track_extents
@@ -0,0 +1,38 @@
+import threading
+from concurrent.futures import Future
+
+import instrumentation
+
+
+class SingleFlight:
+    """Łączy równoczesne wywołania o tym samym kluczu: wykonuje się tylko pierwsze, pozostałe czekają na jego wynik.
+
+    Wynik nie jest zapamiętywany po zakończeniu wywołania - to robią cache wyżej. Wszyscy oczekujący dostają
+    ten sam obiekt, więc nie wolno go modyfikować w miejscu.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            instrumentation.count(f"{self.name}.shared")
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
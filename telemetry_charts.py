@@ -0,0 +1,99 @@
+import numpy as np
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+from plotly.subplots import make_subplots
+
+CHART_POINTS = 600
+CHART_HEIGHT = 450
+# (pole telemetrii, nazwa serii, wiersz wykresu, kolor linii)
+CHART_SERIES = [('speed', 'Prędkość', 1, None), ('throttle', 'Gaz', 2, 'green'), ('brake', 'Hamulec', 2, 'red'),
+                ('rpm', 'RPM', 3, None), ('n_gear', 'Bieg', 4, None)]
+SUBPLOT_TITLES = ("Prędkość", "Gaz / Hamulec", "Obroty", "Bieg")
+OVERLAY_COLORS = qualitative.Plotly
+
+
+def lttb(x, y, threshold=CHART_POINTS):
+    """Indeksy punktów wybranych algorytmem Largest-Triangle-Three-Buckets, który zachowuje szczyty i kształt serii."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype='int64')
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = (edges[bucket + 1], edges[bucket + 2]) if bucket + 2 < len(edges) else (n - 1, n)
+        mean_x, mean_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        areas = np.abs((x[previous] - mean_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (mean_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def lap_traces(index, driver_number, lap_position, threshold=CHART_POINTS):
+    """Przebiegi telemetrii okrążenia pomniejszone przez LTTB: czas od startu okrążenia i dystans (m) dla każdej serii.
+
+    Dystans to całka prędkości po czasie, więc okrążenia różnej długości można nakładać na wspólnej osi.
+    Zwraca None, gdy okrążenie nie ma próbek.
+    """
+    samples = index.lap_telemetry(driver_number, lap_position)
+    if samples.empty:
+        return None
+    lap_start = index.laps['date_start'].iloc[lap_position]
+    time = (samples['date'] - lap_start).dt.total_seconds().to_numpy(dtype='float64')
+    speed = np.nan_to_num(samples['speed'].to_numpy(dtype='float64', na_value=np.nan))
+    distance = np.concatenate([[0.0], np.cumsum((speed[1:] + speed[:-1]) / 2 / 3.6 * np.diff(time))])
+    series = {}
+    for field, _, _, _ in CHART_SERIES:
+        if field not in samples.columns:
+            continue
+        values = np.nan_to_num(samples[field].to_numpy(dtype='float64', na_value=np.nan))
+        kept = lttb(time, values, threshold)
+        series[field] = (time[kept], distance[kept], values[kept])
+    return {'samples': len(samples), 'lap_length': float(distance[-1]), 'series': series}
+
+
+def _subplots():
+    return make_subplots(rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.05, subplot_titles=SUBPLOT_TITLES)
+
+
+def lap_figure(traces):
+    """Wykres WebGL okrążenia względem czasu; budowany raz na okrążenie i zwracany jako słownik figury."""
+    fig = _subplots()
+    for field, name, row, color in CHART_SERIES:
+        if field in traces['series']:
+            time, _, values = traces['series'][field]
+            line = dict(color=color, shape='hv' if field == 'n_gear' else 'linear')
+            fig.add_trace(go.Scattergl(x=time, y=values, name=name, mode='lines', line=line), row=row, col=1)
+    fig.update_layout(height=CHART_HEIGHT, template="plotly_dark", showlegend=False,
+                      margin=dict(l=20, r=20, t=40, b=20))
+    return fig.to_dict()
+
+
+def with_cursor(figure, seconds):
+    """Płytka kopia figury z pionową linią w chwili `seconds` - jedyna część wykresu zmieniająca się co klatkę."""
+    cursor = dict(type='line', xref='x', yref='paper', x0=seconds, x1=seconds, y0=0, y1=1,
+                  line=dict(color='white', width=2, dash='dash'))
+    return {**figure, 'layout': {**figure['layout'], 'shapes': [cursor]}}
+
+
+def overlay_figure(traces_list, labels):
+    """Nałożone okrążenia (różnych kierowców lub tego samego kierowcy) względem dystansu od startu okrążenia."""
+    fig = _subplots()
+    for i, (traces, label) in enumerate(zip(traces_list, labels)):
+        color = OVERLAY_COLORS[i % len(OVERLAY_COLORS)]
+        for field, name, row, _ in CHART_SERIES:
+            if field not in traces['series']:
+                continue
+            _, distance, values = traces['series'][field]
+            line = dict(color=color, shape='hv' if field == 'n_gear' else 'linear',
+                        dash='dot' if field == 'brake' else 'solid')
+            fig.add_trace(go.Scattergl(x=distance, y=values, name=label, legendgroup=label, mode='lines', line=line,
+                                       showlegend=field == 'speed', hovertemplate=f"{label} {name}: %{{y}}"),
+                          row=row, col=1)
+    fig.update_xaxes(title_text="Dystans (m)", row=4, col=1)
+    fig.update_layout(height=CHART_HEIGHT + 50, template="plotly_dark", margin=dict(l=20, r=20, t=40, b=20),
+                      legend=dict(orientation='h', y=-0.15))
+    return fig.to_dict()
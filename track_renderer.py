@@ -0,0 +1,211 @@
+import io
+import math
+import time
+from functools import lru_cache
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageDraw, ImageFont
+
+import instrumentation
+
+GEAR_COLORS = ['#FFFFFF', '#FF0000', '#FF4500', '#FF8C00', '#FFD700', '#ADFF2F', '#00FF00', '#00BFFF', '#1E90FF']
+BRAKE_THRESHOLD = 50
+RENDER_WIDTH = 1000
+# Rozmiary odpowiadają obrazowi tła o szerokości ~2000 px (dpi=200) i są skalowane do RENDER_WIDTH.
+DOT_RADIUS, BRAKE_MARGIN, LABEL_OFFSET, LABEL_PADDING, FONT_SIZE = 12, 8, 12, 4, 22
+REFERENCE_WIDTH = 2000
+BACKGROUND_COLOR = "#0E1117"
+TRACK_COLOR = "#444444"
+# Grubość linii toru w pikselach przy REFERENCE_WIDTH (jak linewidth=5 pt przy dpi=200).
+TRACK_LINE_WIDTH = 14
+# Dopuszczalne odchylenie uproszczonego obrysu w pikselach obrazu o szerokości REFERENCE_WIDTH. W jednostkach
+# OpenF1 (rzędu decymetrów) zależy od rozmiaru toru: dla toru szerokiego na ~2 km to ok. 5 jednostek (~0.5 m).
+OUTLINE_PIXEL_TOLERANCE = 0.5
+MIN_OUTLINE_SAMPLES = 100
+REFERENCE_LAP_CANDIDATES = 10
+
+
+@lru_cache(maxsize=8)
+def load_font(size):
+    for font_name in ("arialbd.ttf", "DejaVuSans-Bold.ttf"):
+        try:
+            return ImageFont.truetype(font_name, size)
+        except IOError:
+            continue
+    return ImageFont.load_default()
+
+
+def render_track_background(full_data):
+    track_extents = {'min_x': full_data['x'].min(), 'max_x': full_data['x'].max(), 'min_y': full_data['y'].min(),
+                     'max_y': full_data['y'].max()}
+    min_x, max_x, min_y, max_y = track_extents.values()
+    range_x, range_y = max_x - min_x, max_y - min_y
+    ref_driver_num = full_data['driver_number'].iloc[0]
+    track_line_data = full_data[full_data['driver_number'] == ref_driver_num].sort_values('date')
+    fig, ax = plt.subplots(figsize=(10, 10 * (range_y / range_x if range_x != 0 else 1)))
+    ax.plot(track_line_data['x'], track_line_data['y'], color=TRACK_COLOR, linewidth=5, solid_capstyle='round')
+    ax.set_facecolor(BACKGROUND_COLOR)
+    ax.set_aspect('equal')
+    ax.set_xlim(min_x, max_x)
+    ax.set_ylim(min_y, max_y)
+    plt.axis('off')
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight', pad_inches=0, dpi=200)
+    plt.close(fig)
+    buf.seek(0)
+    return Image.open(buf), track_extents
+
+
+def telemetry_extents(telemetry):
+    """Zakres współrzędnych x, y próbek telemetrii."""
+    return {'min_x': float(telemetry['x'].min()), 'max_x': float(telemetry['x'].max()),
+            'min_y': float(telemetry['y'].min()), 'max_y': float(telemetry['y'].max())}
+
+
+def simplify_polyline(points, tolerance):
+    """Upraszcza łamaną algorytmem Ramera-Douglasa-Peuckera z dopuszczalnym odchyleniem `tolerance`."""
+    points = np.asarray(points, dtype='float64')
+    if len(points) < 3:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        chord = points[last] - points[first]
+        inner = points[first + 1:last] - points[first]
+        length = np.hypot(chord[0], chord[1])
+        if length:
+            distances = np.abs(chord[0] * inner[:, 1] - chord[1] * inner[:, 0]) / length
+        else:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.extend([(first, split), (split, last)])
+    return points[keep]
+
+
+def build_track_outline(index, pixel_tolerance=OUTLINE_PIXEL_TOLERANCE):
+    """Uproszczony, zamknięty obrys toru i zakres współrzędnych telemetrii sesji albo (None, None).
+
+    Obrys pochodzi z najszybszego okrążenia, które nie jest wyjazdem z alei serwisowej, więc nie zawiera alei,
+    okrążeń wyjazdowych ani jazdy za czerwoną flagą.
+    """
+    laps = index.laps
+    if laps.empty or index.telemetry.empty:
+        return None, None
+    durations = pd.to_numeric(laps['lap_duration'], errors='coerce')
+    clean = durations.notna()
+    if 'is_pit_out_lap' in laps.columns:
+        clean &= ~laps['is_pit_out_lap'].fillna(False).astype(bool)
+    for position in durations[clean].sort_values(kind='stable').index[:REFERENCE_LAP_CANDIDATES]:
+        lap_samples = index.lap_telemetry(laps['driver_number'].iloc[position], position).dropna(subset=['x', 'y'])
+        if len(lap_samples) >= MIN_OUTLINE_SAMPLES:
+            break
+    else:
+        return None, None
+    track_extents = telemetry_extents(index.telemetry)
+    units_per_pixel = (track_extents['max_x'] - track_extents['min_x']) / REFERENCE_WIDTH
+    points = lap_samples[['x', 'y']].to_numpy(dtype='float64')
+    outline = simplify_polyline(np.vstack([points, points[:1]]), pixel_tolerance * units_per_pixel)
+    return outline, track_extents
+
+
+def rasterize_track(outline, track_extents, width=RENDER_WIDTH, supersample=2):
+    """Rysuje obrys toru bezpośrednio w PIL w dowolnej szerokości (z nadpróbkowaniem dla gładkich krawędzi)."""
+    min_x, max_x, min_y, max_y = track_extents.values()
+    range_x, range_y = max_x - min_x, max_y - min_y
+    height = max(1, round(width * (range_y / range_x if range_x else 1)))
+    canvas_width, canvas_height = width * supersample, height * supersample
+    image = Image.new('RGB', (canvas_width, canvas_height), BACKGROUND_COLOR)
+    if range_x and range_y and len(outline) > 1:
+        px = (outline[:, 0] - min_x) / range_x * canvas_width
+        py = canvas_height - (outline[:, 1] - min_y) / range_y * canvas_height
+        line_width = max(1, round(TRACK_LINE_WIDTH * canvas_width / REFERENCE_WIDTH))
+        ImageDraw.Draw(image).line(list(zip(px.tolist(), py.tolist())), fill=TRACK_COLOR, width=line_width,
+                                   joint='curve')
+    return image.reduce(supersample) if supersample > 1 else image
+
+
+class TrackRenderer:
+    """Rysuje klatki mapy toru z gotowych sprite'ów kierowców na pomniejszonym obrazie tła."""
+
+    def __init__(self, base_image, track_extents, drivers, width=RENDER_WIDTH):
+        width = min(width, base_image.width)
+        height = round(base_image.height * width / base_image.width)
+        self.base_image = base_image.convert('RGB').resize((width, height), Image.LANCZOS)
+        self.track_extents = track_extents
+        self.drivers = drivers
+        self.scale = width / REFERENCE_WIDTH
+        self.font = load_font(max(8, round(FONT_SIZE * self.scale)))
+        self._sprites = {}
+
+    def project(self, x, y):
+        """Rzutuje współrzędne toru wszystkich kierowców naraz na piksele obrazu."""
+        min_x, max_x, min_y, max_y = self.track_extents.values()
+        width, height = self.base_image.size
+        px = (np.asarray(x, dtype='float64') - min_x) / (max_x - min_x) * width
+        py = height - (np.asarray(y, dtype='float64') - min_y) / (max_y - min_y) * height
+        return px, py
+
+    def sprite(self, acronym, color, braking):
+        key = (acronym, color, braking)
+        if key not in self._sprites:
+            self._sprites[key] = self._build_sprite(acronym, color, braking)
+        return self._sprites[key]
+
+    def _build_sprite(self, acronym, color, braking):
+        radius = max(3, round(DOT_RADIUS * self.scale))
+        brake_radius = radius + max(2, round(BRAKE_MARGIN * self.scale))
+        label_offset = radius + round(LABEL_OFFSET * self.scale)
+        padding = max(2, round(LABEL_PADDING * self.scale))
+        left, top, right, bottom = ImageDraw.Draw(Image.new('RGBA', (1, 1))).textbbox((0, 0), acronym, font=self.font,
+                                                                                       anchor="ms")
+        half_width = math.ceil(max(brake_radius, -left + padding, right + padding)) + 1
+        up = math.ceil(max(brake_radius, label_offset - top + padding)) + 1
+        down = brake_radius + 1
+        sprite = Image.new('RGBA', (2 * half_width, up + down), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(sprite, 'RGBA')
+        cx, cy = half_width, up
+        if braking:
+            draw.ellipse([cx - brake_radius, cy - brake_radius, cx + brake_radius, cy + brake_radius],
+                         fill=(255, 20, 20, 200))
+        draw.ellipse([cx - radius, cy - radius, cx + radius, cy + radius], fill=color, outline='black',
+                     width=max(1, round(2 * self.scale)))
+        text_anchor_point = (cx, cy - label_offset)
+        text_bbox = draw.textbbox(text_anchor_point, acronym, font=self.font, anchor="ms")
+        draw.rectangle([text_bbox[0] - padding, text_bbox[1] - padding, text_bbox[2] + padding,
+                        text_bbox[3] + padding], fill=(0, 0, 0, 160))
+        draw.text(text_anchor_point, acronym, fill="white", font=self.font, anchor="ms")
+        return sprite, (cx, cy)
+
+    def render(self, frame, map_mode):
+        started = time.perf_counter()
+        frame_image = self.base_image.copy()
+        min_x, max_x, min_y, max_y = self.track_extents.values()
+        if not frame.empty and max_x > min_x and max_y > min_y:
+            px, py = self.project(frame['x'].to_numpy(), frame['y'].to_numpy())
+            driver_numbers = frame['driver_number'].astype('int64').to_numpy()
+            gear_mode = map_mode == "Biegi i Hamowanie"
+            if gear_mode:
+                gears = frame['n_gear'].to_numpy() if 'n_gear' in frame else np.zeros(len(frame))
+                braking = (frame['brake'].to_numpy() > BRAKE_THRESHOLD) if 'brake' in frame else np.zeros(len(frame),
+                                                                                                            bool)
+            for i, driver_number in enumerate(driver_numbers):
+                driver_info = self.drivers.get(int(driver_number), {})
+                if gear_mode:
+                    gear = int(gears[i]) if 0 <= gears[i] < len(GEAR_COLORS) else 0
+                    sprite, (cx, cy) = self.sprite(driver_info.get('name_acronym', ''), GEAR_COLORS[gear],
+                                                   bool(braking[i]))
+                else:
+                    sprite, (cx, cy) = self.sprite(driver_info.get('name_acronym', ''),
+                                                   driver_info.get('team_colour', '#FFFFFF'), False)
+                frame_image.paste(sprite, (int(round(px[i] - cx)), int(round(py[i] - cy))), sprite)
+        instrumentation.record('frame_render', (time.perf_counter() - started) * 1000, drivers=len(frame))
+        return frame_image